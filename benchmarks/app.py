@@ -0,0 +1,13 @@
+# benchmarks/app.py
+#
+# ASGI entry point used by run.py: the normal app, with the stub backend
+# registered so WASTE_LOGGER_BACKEND=stub works. run.py sets the database,
+# static directory and class index through the environment.
+#
+#   uvicorn benchmarks.app:app
+
+from benchmarks import stub_model
+
+stub_model.install()
+
+from waste_logger_app.main import app  # noqa: E402
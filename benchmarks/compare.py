@@ -0,0 +1,62 @@
+# benchmarks/compare.py
+#
+# Compare two benchmarks.run result files:
+#
+#   python -m benchmarks.compare bench/before.json bench/after.json --max-regression 10
+#
+# Exits with status 1 when a scenario's p95 grows (or its throughput drops)
+# by more than --max-regression percent.
+
+import argparse
+import json
+import sys
+
+METRICS = ("rps", "p50_ms", "p95_ms", "p99_ms")
+
+
+def _change(before, after):
+    if not before:
+        return None
+    return (after - before) / before * 100.0
+
+
+def compare(before, after, max_regression):
+    regressions = []
+    for name in sorted(set(before["scenarios"]) & set(after["scenarios"])):
+        old, new = before["scenarios"][name], after["scenarios"][name]
+        cells = []
+        for metric in METRICS:
+            change = _change(old.get(metric), new.get(metric))
+            cells.append(f"{metric} {new.get(metric, 0):.1f} ({'n/a' if change is None else f'{change:+.1f}%'})")
+        print(f"{name:>9}: " + "  ".join(cells))
+
+        p95_change = _change(old.get("p95_ms"), new.get("p95_ms"))
+        rps_change = _change(old.get("rps"), new.get("rps"))
+        if p95_change is not None and p95_change > max_regression:
+            regressions.append(f"{name} p95 {p95_change:+.1f}%")
+        if rps_change is not None and -rps_change > max_regression:
+            regressions.append(f"{name} rps {rps_change:+.1f}%")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument("before")
+    parser.add_argument("after")
+    parser.add_argument("--max-regression", type=float, default=10.0, help="percent")
+    args = parser.parse_args()
+
+    with open(args.before) as f:
+        before = json.load(f)
+    with open(args.after) as f:
+        after = json.load(f)
+    print(f"{(before.get('git_commit') or '?')[:10]} -> {(after.get('git_commit') or '?')[:10]}")
+
+    regressions = compare(before, after, args.max_regression)
+    if regressions:
+        print("Regressions: " + ", ".join(regressions))
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/generate_data.py
+#
+# Fills a benchmark database with synthetic users and waste logs.
+#
+#   python -m benchmarks.generate_data --db bench/bench.db --users 10000 --logs 5000000
+#
+# Output is reproducible for a given --seed. Every user's password is
+# BENCH_PASSWORD (hashed once), so run.py can log in as any of them. Activity
+# is skewed like real traffic: a few heavy users, a long tail of light ones.
+
+import argparse
+import os
+import random
+import time
+from datetime import datetime, timedelta
+
+BENCH_PASSWORD = "benchmark"
+CHUNK_ROWS = 50000
+
+
+def username(number):
+    return f"bench_user_{number:06d}"
+
+
+def database_url(path):
+    return f"sqlite:///{os.path.abspath(path)}"
+
+
+def _log_rows(count, users, carbon_rows, seed, days):
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    span = days * 86400
+    # Zipf-like weights: user n gets ~1/n of the traffic of user 1
+    weights = [1.0 / (rank + 1) ** 0.8 for rank in range(users)]
+    chosen_users = rng.choices(range(users), weights=weights, k=min(count, CHUNK_ROWS))
+    for number in range(count):
+        if number and number % CHUNK_ROWS == 0:
+            chosen_users = rng.choices(range(users), weights=weights, k=min(count - number, CHUNK_ROWS))
+        label, material, recyclable, co2 = rng.choice(carbon_rows)
+        yield (
+            label,
+            round(rng.uniform(0.2, 0.99), 4),
+            material,
+            recyclable,
+            co2,
+            # Same text format SQLAlchemy writes, so keyset cursors compare correctly
+            (now - timedelta(seconds=rng.randrange(span))).strftime("%Y-%m-%d %H:%M:%S.%f"),
+            username(chosen_users[number % CHUNK_ROWS]),
+            None,
+        )
+
+
+def generate(db_path, users=10000, logs=5000000, seed=42, days=365):
+    # Must be set before the app's database module creates its engine
+    os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+    os.environ["WASTE_LOGGER_DATABASE_URL"] = database_url(db_path)
+
+    from waste_logger_app import aggregates
+    from waste_logger_app.database import engine
+    from waste_logger_app.models.user import User
+    from waste_logger_app.utils.auth import hash_password
+    from benchmarks.stub_model import carbon_rows
+
+    User.__table__.create(bind=engine, checkfirst=True)
+    started = time.monotonic()
+    connection = engine.raw_connection()
+    try:
+        cursor = connection.cursor()
+        cursor.execute("DELETE FROM users")
+        cursor.execute("DELETE FROM waste_logs")
+        hashed = hash_password(BENCH_PASSWORD)
+        cursor.executemany(
+            "INSERT INTO users (username, email, hashed_password) VALUES (?, ?, ?)",
+            [(username(n), f"{username(n)}@bench.local", hashed) for n in range(users)],
+        )
+
+        insert = (
+            "INSERT INTO waste_logs (label, confidence, material, recyclable, co2_estimate, timestamp, username, filename)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)"
+        )
+        batch = []
+        for written, row in enumerate(_log_rows(logs, users, carbon_rows(), seed, days), start=1):
+            batch.append(row)
+            if len(batch) >= CHUNK_ROWS:
+                cursor.executemany(insert, batch)
+                batch = []
+                print(f"{written} logs written, {written / (time.monotonic() - started):.0f} rows/s")
+        if batch:
+            cursor.executemany(insert, batch)
+        connection.commit()
+    finally:
+        connection.close()
+
+    aggregates.ensure_indexes()
+    aggregates.rebuild()
+    print(f"Generated {users} users and {logs} logs in {time.monotonic() - started:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic benchmark database")
+    parser.add_argument("--db", default="bench/bench.db")
+    parser.add_argument("--users", type=int, default=10000)
+    parser.add_argument("--logs", type=int, default=5000000)
+    parser.add_argument("--days", type=int, default=365, help="spread log timestamps over this many days")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    generate(args.db, users=args.users, logs=args.logs, seed=args.seed, days=args.days)
+
+
+if __name__ == "__main__":
+    main()
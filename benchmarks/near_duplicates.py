@@ -0,0 +1,273 @@
+# benchmarks/near_duplicates.py
+#
+# Hit rate and lookup latency of the near-duplicate index (waste_logger_app/near_duplicates.py).
+#
+#   python -m benchmarks.near_duplicates --dir waste_logger_app/static --index-size 100000
+#
+# Every distinct image under --dir is hashed the way /classify hashes it
+# (preprocessing.prepare_image), then re-uploaded as the variants a user
+# produces without meaning to: recompressed, cropped, downscaled, re-saved
+# with EXIF, slightly brighter. For each distance threshold a variant is a
+# hit when its nearest match shows the same picture as its source (files
+# that differ only in encoding count as one picture) and a false match when
+# it is a different one.
+#
+# Lookup latency is measured on --index-size hashes (the real ones padded
+# with random ones) for the multi-index hash table the app uses, a BK-tree
+# and a linear scan, with queries that hit (a stored hash with a few bits
+# flipped) and queries that miss (new random hashes, the usual case for a
+# fresh upload). Nothing touches the database or the files under --dir.
+
+import argparse
+import hashlib
+import io
+import json
+import os
+import random
+import time
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from waste_logger_app.preprocessing import prepare_image
+from waste_logger_app.utils.hamming_index import MultiIndexHash, hamming
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff")
+DEFAULT_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "waste_logger_app", "static")
+
+
+def _jpeg(image, **options):
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", **options)
+    return buffer.getvalue()
+
+
+def _crop(image, fraction):
+    dx, dy = int(image.width * fraction), int(image.height * fraction)
+    return image.crop((dx, dy, image.width - dx, image.height - dy))
+
+
+def _with_exif(image):
+    exif = Image.Exif()
+    exif[0x0110] = "Phone camera"  # Model
+    exif[0x0112] = 1  # Orientation: normal
+    return _jpeg(image, quality=90, exif=exif.tobytes())
+
+
+VARIANTS = {
+    "jpeg_q70": lambda image: _jpeg(image, quality=70),
+    "jpeg_q40": lambda image: _jpeg(image, quality=40),
+    "crop_3pct": lambda image: _jpeg(_crop(image, 0.03), quality=90),
+    "crop_8pct": lambda image: _jpeg(_crop(image, 0.08), quality=90),
+    "half_size": lambda image: _jpeg(image.resize((max(1, image.width // 2), max(1, image.height // 2))), quality=85),
+    "exif": _with_exif,
+    "brighter": lambda image: _jpeg(ImageEnhance.Brightness(image.convert("RGB")).enhance(1.1), quality=90),
+}
+
+
+def load_sources(directory):
+    # (name, bytes) of every readable image, exact duplicates removed
+    sources, seen = [], set()
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.lower().endswith(IMAGE_SUFFIXES) or not os.path.isfile(path):
+            continue
+        with open(path, "rb") as f:
+            contents = f.read()
+        digest = hashlib.sha256(contents).digest()
+        if digest in seen:
+            continue
+        try:
+            Image.open(io.BytesIO(contents)).verify()
+        except Exception:
+            continue
+        seen.add(digest)
+        sources.append((name, contents))
+    return sources
+
+
+def picture_groups(sources, tolerance=4.0):
+    # Group index per source: files whose 64x64 renderings differ by less than
+    # `tolerance` grey levels on average are the same picture in another encoding
+    small = [
+        np.asarray(Image.open(io.BytesIO(contents)).convert("RGB").resize((64, 64)), dtype=np.float32)
+        for _, contents in sources
+    ]
+    groups = list(range(len(sources)))
+    for i in range(len(sources)):
+        for j in range(i):
+            if groups[j] == j and np.abs(small[i] - small[j]).mean() < tolerance:
+                groups[i] = j
+                break
+    return groups
+
+
+def hit_rates(source_hashes, groups, variant_hashes, max_distance):
+    # variant_hashes: [(variant, source index, hash)]
+    rows = {}
+    for threshold in range(max_distance + 1):
+        hits = false_matches = 0
+        per_variant = {}
+        for variant, source, value in variant_hashes:
+            distance, nearest = min((hamming(value, h), index) for index, h in enumerate(source_hashes))
+            matched = distance <= threshold
+            hit = matched and groups[nearest] == groups[source]
+            hits += hit
+            false_matches += matched and not hit
+            per_variant.setdefault(variant, []).append(hit)
+        rows[threshold] = {
+            "hit_rate": round(hits / len(variant_hashes), 3),
+            "false_match_rate": round(false_matches / len(variant_hashes), 3),
+            "by_variant": {name: round(sum(v) / len(v), 3) for name, v in per_variant.items()},
+        }
+    return rows
+
+
+class BKTree:
+    # Baseline for the latency comparison: metric tree over Hamming distance
+    def __init__(self):
+        self._root = None  # [key, values, {distance: child}]
+
+    def add(self, key, value):
+        if self._root is None:
+            self._root = [key, [value], {}]
+            return
+        node = self._root
+        while True:
+            distance = hamming(key, node[0])
+            if distance == 0:
+                node[1].append(value)
+                return
+            child = node[2].get(distance)
+            if child is None:
+                node[2][distance] = [key, [value], {}]
+                return
+            node = child
+
+    def search(self, key, max_distance):
+        found, stack = [], [self._root] if self._root else []
+        while stack:
+            node_key, values, children = stack.pop()
+            distance = hamming(key, node_key)
+            if distance <= max_distance:
+                found.extend((distance, value) for value in values)
+            stack.extend(child for edge, child in children.items() if abs(edge - distance) <= max_distance)
+        return found
+
+
+def _summary(seconds):
+    us = np.asarray(seconds) * 1e6
+    return {
+        "p50_us": round(float(np.percentile(us, 50)), 1),
+        "p99_us": round(float(np.percentile(us, 99)), 1),
+        "mean_us": round(float(us.mean()), 1),
+    }
+
+
+def _time(search, queries):
+    timings = []
+    for value in queries:
+        started = time.perf_counter()
+        search(value)
+        timings.append(time.perf_counter() - started)
+    return _summary(timings)
+
+
+def lookup_latency(source_hashes, index_size, distance, seed, queries=500, linear_queries=50):
+    rng = random.Random(seed)
+    hashes = list(source_hashes) + [rng.getrandbits(64) for _ in range(max(0, index_size - len(source_hashes)))]
+    rng.shuffle(hashes)
+
+    def near(value):
+        for bit in rng.sample(range(64), rng.randint(0, distance)):
+            value ^= 1 << bit
+        return value
+
+    hit_queries = [near(rng.choice(hashes)) for _ in range(queries)]
+    miss_queries = [rng.getrandbits(64) for _ in range(queries)]
+
+    table, tree = MultiIndexHash(distance), BKTree()
+    started = time.perf_counter()
+    for index, value in enumerate(hashes):
+        table.add(value, index)
+    build_seconds = time.perf_counter() - started
+    for index, value in enumerate(hashes):
+        tree.add(value, index)
+
+    structures = {
+        "multi_index": lambda value: table.search(value),
+        "bktree": lambda value: tree.search(value, distance),
+        "linear_scan": lambda value: [h for h in hashes if hamming(value, h) <= distance],
+    }
+    results = {"index_size": len(hashes), "distance": distance, "build_seconds": round(build_seconds, 3)}
+    for name, search in structures.items():
+        count = linear_queries if name == "linear_scan" else queries
+        results[name] = {"hit": _time(search, hit_queries[:count]), "miss": _time(search, miss_queries[:count])}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the perceptual-hash near-duplicate index")
+    parser.add_argument("--dir", default=DEFAULT_DIR, help="directory of source images (default: the app's static/)")
+    parser.add_argument("--max-distance", type=int, default=10, help="report hit rates for thresholds 0..N")
+    parser.add_argument("--distance", type=int, default=2, help="threshold for the latency measurement (app default: 2)")
+    parser.add_argument("--index-size", type=int, default=100000, help="entries in the latency index")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    sources = load_sources(args.dir)
+    if not sources:
+        parser.error(f"no images found under {args.dir}")
+
+    source_hashes = [prepare_image(contents).dhash for _, contents in sources]
+    groups = picture_groups(sources)
+    variant_hashes = []
+    for index, (_, contents) in enumerate(sources):
+        image = Image.open(io.BytesIO(contents))
+        for variant, make in VARIANTS.items():
+            variant_hashes.append((variant, index, prepare_image(make(image)).dhash))
+
+    pairwise = [
+        hamming(source_hashes[i], source_hashes[j])
+        for i in range(len(sources)) for j in range(i) if groups[i] != groups[j]
+    ]
+    rates = hit_rates(source_hashes, groups, variant_hashes, args.max_distance)
+    latency = lookup_latency(source_hashes, args.index_size, args.distance, args.seed)
+
+    print(f"{len(sources)} distinct files, {len(set(groups))} distinct pictures, {len(variant_hashes)} variants")
+    if pairwise:
+        print(f"distance between different pictures: min {min(pairwise)}, median {int(np.median(pairwise))}")
+    print(f"{'distance':>8}  {'hit rate':>8}  {'false':>6}  " + "  ".join(f"{name:>9}" for name in VARIANTS))
+    for threshold, row in rates.items():
+        print(
+            f"{threshold:>8}  {row['hit_rate']:>8.1%}  {row['false_match_rate']:>6.1%}  "
+            + "  ".join(f"{row['by_variant'][name]:>9.0%}" for name in VARIANTS)
+        )
+    print(
+        f"lookup at distance {latency['distance']} over {latency['index_size']} hashes "
+        f"(multi-index table built in {latency['build_seconds']} s):"
+    )
+    for name in ("multi_index", "bktree", "linear_scan"):
+        hit, miss = latency[name]["hit"], latency[name]["miss"]
+        print(
+            f"  {name:>11}: hit p50 {hit['p50_us']:>9.1f} us  p99 {hit['p99_us']:>9.1f} us   "
+            f"miss p50 {miss['p50_us']:>9.1f} us  p99 {miss['p99_us']:>9.1f} us"
+        )
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump({
+                "files": len(sources),
+                "pictures": len(set(groups)),
+                "variants": len(variant_hashes),
+                "pairwise_min_distance": min(pairwise) if pairwise else None,
+                "hit_rates": rates,
+                "latency": latency,
+            }, f, indent=2)
+        print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+# benchmarks/run.py
+#
+# Load scenarios against a uvicorn server started on a benchmark database.
+#
+#   python -m benchmarks.generate_data --db bench/bench.db --users 10000 --logs 5000000
+#   python -m benchmarks.run --db bench/bench.db --concurrency 16 --duration 20 --output bench/results.json
+#   python -m benchmarks.compare bench/before.json bench/results.json
+#
+# By default the server uses the deterministic stub model (benchmarks/stub_model.py);
+# --real-model runs the configured backend instead (WASTE_LOGGER_BACKEND,
+# weights, class index from the environment). --url targets a server that is
+# already running and skips starting one.
+#
+# Results (p50/p95/p99 latency, requests per second, error counts per
+# scenario, plus the git commit and settings) are written as JSON.
+
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import httpx
+import numpy as np
+from PIL import Image
+
+from benchmarks import stub_model
+from benchmarks.generate_data import BENCH_PASSWORD, database_url, username
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SCENARIOS = {
+    "classify": ("POST", "/classify"),
+    # Same pictures under new bytes: misses the exact cache, hits the near-duplicate index
+    "classify_near_duplicate": ("POST", "/classify"),
+    "index": ("GET", "/"),
+    "log": ("GET", "/log"),
+    "public": ("GET", "/public"),
+}
+
+
+def synthetic_image(rng, size=(640, 480)):
+    # A reproducible JPEG: colour blocks plus noise
+    blocks = rng.integers(0, 256, size=(6, 8, 3), dtype=np.uint8)
+    pixels = np.kron(blocks, np.ones((size[1] // 6, size[0] // 8, 1), dtype=np.uint8))
+    pixels = np.clip(pixels.astype(np.int16) + rng.integers(-20, 20, pixels.shape), 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def synthetic_images(count, seed=7, size=(640, 480)):
+    # Distinct pictures, so they miss both caches until they have been seen once
+    rng = np.random.default_rng(seed)
+    return [synthetic_image(rng, size) for _ in range(count)]
+
+
+def percentile_summary(latencies, errors, elapsed):
+    ms = np.asarray(latencies) * 1000.0
+    if not len(ms):
+        return {"requests": 0, "errors": errors, "rps": 0.0}
+    return {
+        "requests": int(len(ms)),
+        "errors": errors,
+        "rps": round(len(ms) / elapsed, 2),
+        "mean_ms": round(float(ms.mean()), 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+        "max_ms": round(float(ms.max()), 2),
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(args, workdir):
+    port = _free_port()
+    env = dict(os.environ)
+    env["WASTE_LOGGER_DATABASE_URL"] = database_url(args.db)
+    env["WASTE_LOGGER_STATIC_DIR"] = os.path.join(workdir, "static")
+    env["PYTHONPATH"] = REPO_ROOT + os.pathsep + env.get("PYTHONPATH", "")
+    if args.real_model:
+        target = "waste_logger_app.main:app"
+    else:
+        target = "benchmarks.app:app"
+        env["WASTE_LOGGER_BACKEND"] = "stub"
+        env["WASTE_LOGGER_CLASS_INDEX_PATH"] = stub_model.write_class_index(os.path.join(workdir, "stub_class_index.json"))
+    command = [
+        sys.executable, "-m", "uvicorn", target,
+        "--host", "127.0.0.1", "--port", str(port),
+        "--workers", str(args.workers), "--log-level", "warning",
+    ]
+    process = subprocess.Popen(command, cwd=REPO_ROOT, env=env)
+    return process, f"http://127.0.0.1:{port}"
+
+
+def wait_until_ready(base_url, process=None, timeout=300):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise SystemExit(f"Server exited with code {process.returncode}")
+        try:
+            if httpx.get(f"{base_url}/readyz", timeout=2).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise SystemExit(f"Server at {base_url} not ready after {timeout}s")
+
+
+async def _logged_in_client(base_url, number):
+    client = httpx.AsyncClient(base_url=base_url, timeout=60)
+    response = await client.post("/login", data={"username": username(number), "password": BENCH_PASSWORD})
+    if "session" not in client.cookies:
+        raise SystemExit(f"Login as {username(number)} failed ({response.status_code}); was generate_data run?")
+    return client
+
+
+async def run_scenario(name, base_url, args, images):
+    method, path = SCENARIOS[name]
+    rng = random.Random(args.seed)
+    # Spread clients over the user population, heavy and light users alike
+    users = rng.sample(range(args.users), min(args.concurrency, args.users))
+    clients = await asyncio.gather(*(_logged_in_client(base_url, number) for number in users))
+
+    latencies, errors = [], 0
+    upload_counter = 0
+    measuring = False
+
+    def next_upload():
+        nonlocal upload_counter
+        upload_counter += 1
+        data = images[upload_counter % len(images)]
+        if name == "classify_near_duplicate":
+            # Bytes after the JPEG end marker change the SHA-256 but not the picture (or its dHash)
+            data = data + upload_counter.to_bytes(8, "big")
+        elif args.unique_uploads:
+            # A new picture every time: new bytes alone would be a near-duplicate hit
+            data = synthetic_image(np.random.default_rng((args.seed, upload_counter)))
+        return {"file": (f"bench_{upload_counter}.jpg", data, "image/jpeg")}
+
+    async def worker(client, stop_at):
+        nonlocal errors
+        while time.monotonic() < stop_at:
+            files = next_upload() if method == "POST" else None  # not part of the measured latency
+            started = time.perf_counter()
+            try:
+                if method == "POST":
+                    response = await client.post(path, files=files)
+                else:
+                    response = await client.get(path)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            elapsed = time.perf_counter() - started
+            if measuring:
+                if failed:
+                    errors += 1
+                else:
+                    latencies.append(elapsed)
+
+    try:
+        if args.warmup > 0:
+            stop_at = time.monotonic() + args.warmup
+            await asyncio.gather(*(worker(client, stop_at) for client in clients))
+        measuring = True
+        started = time.monotonic()
+        stop_at = started + args.duration
+        await asyncio.gather(*(worker(client, stop_at) for client in clients))
+        elapsed = time.monotonic() - started
+    finally:
+        await asyncio.gather(*(client.aclose() for client in clients))
+    return percentile_summary(latencies, errors, elapsed)
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, text=True, stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run load scenarios against the waste logger")
+    parser.add_argument("--db", default="bench/bench.db", help="database made by benchmarks.generate_data")
+    parser.add_argument("--users", type=int, default=10000, help="user count passed to generate_data")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="measured seconds per scenario")
+    parser.add_argument("--warmup", type=float, default=3.0, help="unmeasured seconds before each scenario")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--images", type=int, default=64, help="distinct synthetic images for /classify")
+    parser.add_argument("--unique-uploads", action="store_true", help="new picture per classify upload (misses both caches)")
+    parser.add_argument("--real-model", action="store_true", help="use the configured backend instead of the stub")
+    parser.add_argument("--url", help="benchmark an already running server instead of starting one")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="bench/results.json")
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    if not args.url and not os.path.exists(args.db):
+        parser.error(f"{args.db} does not exist; run python -m benchmarks.generate_data first")
+
+    workdir = os.path.dirname(os.path.abspath(args.db))
+    process = None
+    if args.url:
+        base_url = args.url.rstrip("/")
+    else:
+        process, base_url = start_server(args, workdir)
+    try:
+        wait_until_ready(base_url, process)
+        images = synthetic_images(args.images, seed=args.seed)
+        results = {}
+        for name in scenarios:
+            results[name] = asyncio.run(run_scenario(name, base_url, args, images))
+            summary = results[name]
+            print(
+                f"{name:>23}: {summary['rps']:8.1f} req/s  p50 {summary.get('p50_ms', 0):8.1f} ms  "
+                f"p95 {summary.get('p95_ms', 0):8.1f} ms  p99 {summary.get('p99_ms', 0):8.1f} ms  "
+                f"errors {summary['errors']}"
+            )
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    report = {
+        "git_commit": git_commit(),
+        "created_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "mode": "real-model" if args.real_model else "stub",
+        "config": {k: v for k, v in vars(args).items() if k not in ("output", "url")},
+        "scenarios": results,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote {args.output}")
+
+
+if __name__ == "__main__":
+    main()
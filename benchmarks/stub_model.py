@@ -0,0 +1,74 @@
+# benchmarks/stub_model.py
+#
+# Deterministic stand-in for the MobileNetV2 backend so benchmarks run
+# offline, without TensorFlow or a weights download. The same image always
+# gets the same class, and classes map onto carbon_table.csv labels so the
+# carbon lookup does real work. A configurable sleep stands in for the
+# predict cost (per batch + per image).
+
+import csv
+import json
+import os
+import time
+import zlib
+
+import numpy as np
+
+from waste_logger_app import carbon_utils
+
+NUM_CLASSES = 1000
+
+BATCH_LATENCY_MS = float(os.environ.get("WASTE_LOGGER_STUB_BATCH_MS", "5"))
+PER_IMAGE_LATENCY_MS = float(os.environ.get("WASTE_LOGGER_STUB_PER_IMAGE_MS", "2"))
+
+
+class StubBackend:
+    name = "stub"
+
+    def __init__(self, batch_ms=BATCH_LATENCY_MS, per_image_ms=PER_IMAGE_LATENCY_MS, **_):
+        self.batch_ms = batch_ms
+        self.per_image_ms = per_image_ms
+
+    def predict(self, batch):
+        batch = np.asarray(batch)
+        probs = np.full((len(batch), NUM_CLASSES), 0.2 / (NUM_CLASSES - 2), dtype=np.float32)
+        for row, image in enumerate(batch):
+            top = zlib.crc32(image[::8, ::8].tobytes()) % NUM_CLASSES
+            probs[row, top] = 0.6
+            probs[row, (top + 1) % NUM_CLASSES] = 0.2
+        delay = (self.batch_ms + self.per_image_ms * len(batch)) / 1000.0
+        if delay > 0:
+            time.sleep(delay)
+        return probs
+
+
+def carbon_rows():
+    # (label, material, recyclable, co2_kg) from carbon_table.csv, first row per label
+    rows = {}
+    with open(carbon_utils.CARBON_TABLE_PATH, newline="") as f:
+        for row in csv.DictReader(f):
+            rows.setdefault(row["label"], (
+                row["label"], row["material"], row["recyclable"].strip().lower() == "true", float(row["co2_kg"]),
+            ))
+    return list(rows.values())
+
+
+def class_names():
+    # Carbon table labels first, then filler names that fall back to the unknown impact
+    labels = [row[0] for row in carbon_rows()][:NUM_CLASSES]
+    return labels + [f"stub_class_{i}" for i in range(len(labels), NUM_CLASSES)]
+
+
+def write_class_index(path):
+    # Same layout as Keras' imagenet_class_index.json: {"0": ["id", "name"], ...}
+    index = {str(i): [f"n{i:08d}", name] for i, name in enumerate(class_names())}
+    with open(path, "w") as f:
+        json.dump(index, f)
+    return path
+
+
+def install():
+    # Make WASTE_LOGGER_BACKEND=stub resolvable before model_loader builds its backend
+    from waste_logger_app import inference_backends
+
+    inference_backends.BACKENDS["stub"] = StubBackend
@@ -0,0 +1,67 @@
+# tests/conftest.py
+#
+# The app reads its configuration from the environment at import time, so
+# point it at a scratch database, a scratch static/ and the benchmark stub
+# model before any test imports waste_logger_app. Run from the repo root:
+#
+#   python -m pytest -q
+
+import os
+import shutil
+import tempfile
+
+_WORKDIR = tempfile.mkdtemp(prefix="waste-logger-tests-")
+
+os.environ["WASTE_LOGGER_DATABASE_URL"] = f"sqlite:///{os.path.join(_WORKDIR, 'test.db')}"
+os.environ["WASTE_LOGGER_STATIC_DIR"] = os.path.join(_WORKDIR, "static")
+os.environ["WASTE_LOGGER_BACKEND"] = "stub"
+os.environ["WASTE_LOGGER_STUB_BATCH_MS"] = "0"
+os.environ["WASTE_LOGGER_STUB_PER_IMAGE_MS"] = "0"
+os.environ["WASTE_LOGGER_PRELOAD_MODEL"] = "0"
+os.environ["WASTE_LOGGER_MAX_UPLOAD_BYTES"] = str(256 * 1024)
+os.environ["WASTE_LOGGER_AUTH_WORKERS"] = "1"
+
+from benchmarks import stub_model  # noqa: E402
+
+stub_model.install()
+os.environ["WASTE_LOGGER_CLASS_INDEX_PATH"] = stub_model.write_class_index(os.path.join(_WORKDIR, "class_index.json"))
+
+import io  # noqa: E402
+
+import pytest  # noqa: E402
+from PIL import Image  # noqa: E402
+
+
+def png_bytes(size=(64, 48), color=(30, 120, 200)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def pytest_unconfigure(config):
+    shutil.rmtree(_WORKDIR, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def app():
+    from waste_logger_app.main import app
+
+    return app
+
+
+@pytest.fixture(scope="session")
+def client(app):
+    from fastapi.testclient import TestClient
+
+    with TestClient(app) as client:
+        client.post("/register", data={"username": "tester", "email": "tester@example.com", "password": "password1"})
+        client.post("/login", data={"username": "tester", "password": "password1"})
+        yield client
+
+
+@pytest.fixture
+def model_ready():
+    from waste_logger_app import model_loader
+
+    model_loader.load_model()
+    return model_loader
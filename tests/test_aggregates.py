@@ -0,0 +1,38 @@
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from waste_logger_app import aggregates
+from waste_logger_app.database import SessionLocal, DailyRollup, UserStats, WasteLog
+
+
+def _entry(username, co2, recyclable=True, timestamp=datetime(2024, 5, 1, 9, 30)):
+    return WasteLog(label="tin_can", confidence=0.9, material="metal", recyclable=recyclable,
+                    co2_estimate=co2, username=username, timestamp=timestamp)
+
+
+def test_record_waste_logs_accumulates_on_existing_rows():
+    with SessionLocal() as db:
+        aggregates.record_waste_logs(db, [_entry("agg-user", 0.2)])
+        aggregates.record_waste_logs(db, [_entry("agg-user", 0.3, recyclable=False, timestamp=datetime(2024, 5, 2))])
+        db.commit()
+        stats = db.get(UserStats, "agg-user")
+        assert (stats.entry_count, stats.recyclable_count) == (2, 1)
+        assert stats.total_co2 == pytest.approx(0.5)
+        assert stats.last_activity == datetime(2024, 5, 2)
+        assert db.query(DailyRollup).filter(DailyRollup.username == "agg-user").count() == 2
+
+
+def test_postgresql_gets_its_own_upsert():
+    statements = list(aggregates.upsert_statements("postgresql", [_entry("pg-user", 0.2)]))
+    sql = " ".join(str(stmt.compile(dialect=postgresql.dialect())) for stmt in statements)
+    assert sql.count("ON CONFLICT") == 2
+    assert "greatest(" in sql and "max(" not in sql
+
+
+def test_other_databases_are_refused_at_startup():
+    with pytest.raises(RuntimeError, match="mysql"):
+        aggregates.check_dialect(SimpleNamespace(dialect=SimpleNamespace(name="mysql")))
+    aggregates.check_dialect()  # the test database is SQLite
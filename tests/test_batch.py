@@ -0,0 +1,43 @@
+import json
+
+from waste_logger_app.database import SessionLocal, WasteLog
+
+from conftest import png_bytes
+
+
+def _lines(response):
+    # Lines arrive in completion order, not upload order
+    return {line["file"]: line for line in map(json.loads, response.text.splitlines())}
+
+
+def test_batch_reports_every_file_past_the_limit(client, model_ready, monkeypatch):
+    from waste_logger_app.routes import batch
+
+    monkeypatch.setattr(batch, "MAX_BATCH_FILES", 2)
+    files = [("files", (f"{i}.png", png_bytes(color=(i * 50, 0, 0)), "image/png")) for i in range(4)]
+    files.append(("files", ("notes.txt", b"not an image", "text/plain")))
+    response = client.post("/classify/batch", files=files)
+    assert response.status_code == 200
+    lines = _lines(response)
+    assert sorted(lines) == ["0.png", "1.png", "2.png", "3.png", "notes.txt"]
+    assert "label" in lines["0.png"] and "label" in lines["1.png"]
+    for name in ("2.png", "3.png", "notes.txt"):
+        assert "batch limit of 2 files" in lines[name]["error"]
+
+
+def test_batch_rows_are_committed_when_the_stream_ends(client, model_ready, monkeypatch):
+    from waste_logger_app.routes import batch
+
+    # Fewer slots than files, so the stream has to wait on earlier items
+    monkeypatch.setattr(batch, "BATCH_INFLIGHT", 2)
+    files = [("files", (f"c{i}.png", png_bytes(color=(10, i * 40, 90)), "image/png")) for i in range(5)]
+    files.append(("files", ("broken.png", b"\x89PNG\r\n\x1a\n" + b"\0" * 64, "image/png")))
+    response = client.post("/classify/batch", files=files)
+    assert response.status_code == 200
+    lines = _lines(response)
+    assert lines["broken.png"] == {"file": "broken.png", "error": "not a readable image"}
+
+    stored = {f"c{i}.png": lines[f"c{i}.png"]["image_path"].removeprefix("/static/") for i in range(5)}
+    with SessionLocal() as db:
+        rows = db.query(WasteLog).filter(WasteLog.filename.in_(stored.values())).all()
+    assert {row.filename for row in rows} == set(stored.values())
@@ -0,0 +1,38 @@
+import numpy as np
+
+from waste_logger_app.carbon_utils import UNKNOWN_IMPACT, CarbonEntry, CarbonIndex, ClassCarbonVectors
+
+ENTRIES = {
+    "plastic bottle": CarbonEntry("plastic", True, 0.08),
+    "tin_can": CarbonEntry("metal", True, 0.2),
+    "cardboard box": CarbonEntry("paper", True, 0.1),
+}
+
+
+def test_lookup_normalizes_case_and_separators():
+    index = CarbonIndex(ENTRIES)
+    assert index.lookup("Plastic_Bottle") == ("plastic", True, 0.08)
+    assert index.lookup("tin-can") == index.lookup("TIN CAN") == ("metal", True, 0.2)
+    assert index.lookup_many(["plastic  bottle", "envelope"]) == [("plastic", True, 0.08), UNKNOWN_IMPACT]
+
+
+def test_no_built_in_aliases():
+    # Other names for an item are rows in carbon_table.csv, not guesses in code
+    assert "envelope" not in CarbonIndex(ENTRIES)
+
+
+
+def test_carbon_fields_follow_the_current_table():
+    # Cached model outputs (top-k ids and probs) are re-priced against whichever table is current
+    probs = np.array([[0.5, 0.3, 0.2]], dtype=np.float32)
+    vectors = ClassCarbonVectors(["plastic_bottle", "tin_can", "goldfish"], CarbonIndex(ENTRIES))
+    (classes,), (weights,) = vectors.top_k(probs, top_k=2)
+    assert list(classes) == [0, 1] and np.allclose(weights, [0.5, 0.3])
+
+    material, recyclable, co2 = vectors.impact(classes, weights)
+    assert (material, recyclable) == ("plastic", True)
+    assert np.isclose(co2, (0.5 * 0.08 + 0.3 * 0.2) / 0.8, atol=1e-4)
+
+    edited = dict(ENTRIES, tin_can=CarbonEntry("metal", True, 0.6))
+    _, _, co2 = ClassCarbonVectors(["plastic_bottle", "tin_can", "goldfish"], CarbonIndex(edited)).impact(classes, weights)
+    assert np.isclose(co2, (0.5 * 0.08 + 0.3 * 0.6) / 0.8, atol=1e-4)
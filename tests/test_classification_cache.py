@@ -0,0 +1,38 @@
+import threading
+
+from waste_logger_app.classification_cache import ClassificationCache, LRUCache, content_hash
+
+# Model output only: (label, confidence, top_classes, top_probs)
+OUTPUT = ("water_bottle", 0.9, (898, 907), (0.9, 0.05))
+
+
+def test_lru_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    cache.get("a")
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+
+
+def test_persistent_tier_survives_a_new_process_and_model_version_change():
+    key = content_hash(b"persistent tier")
+    ClassificationCache("model-a").put(key, OUTPUT)
+
+    fresh = ClassificationCache("model-a")  # empty memory tier, as after a restart
+    assert fresh.get(key) == OUTPUT
+    assert fresh.get_memory(key) == OUTPUT
+
+    assert ClassificationCache("model-b").get(key) is None
+
+
+def test_counters_are_exact_under_concurrent_hits():
+    cache = ClassificationCache("model-counters")
+    cache.memory.put("key", OUTPUT)
+    threads = [threading.Thread(target=lambda: [cache.get_memory("key") for _ in range(2000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert cache.stats()["hits"] == 16000
@@ -0,0 +1,87 @@
+import struct
+import time
+import zlib
+
+from waste_logger_app import model_loader, uploads
+
+from conftest import png_bytes
+
+
+def _png_header(width, height):
+    # A valid PNG that declares huge dimensions but carries almost no data
+    def chunk(kind, data):
+        return struct.pack("!I", len(data)) + kind + data + struct.pack("!I", zlib.crc32(kind + data))
+
+    header = struct.pack("!IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(b"\0" * 64)) + chunk(b"IEND", b"")
+
+
+def _classify(client, contents, name="upload.png", content_type="image/png"):
+    return client.post("/classify", files={"file": (name, contents, content_type)})
+
+
+def test_classify_returns_503_while_model_loads(client, monkeypatch):
+    monkeypatch.setattr(model_loader, "is_ready", lambda: False)
+    monkeypatch.setattr(model_loader, "start_background_load", lambda: None)
+    monkeypatch.setattr(model_loader, "status", lambda: {"status": "loading", "error": None})
+
+    response = _classify(client, png_bytes())
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "5"
+    assert "still loading" in response.json()["detail"]
+
+
+def test_classify_reports_failed_model_load(client, monkeypatch):
+    monkeypatch.setattr(model_loader, "is_ready", lambda: False)
+    monkeypatch.setattr(model_loader, "start_background_load", lambda: None)
+    monkeypatch.setattr(model_loader, "status", lambda: {"status": "error", "error": "RuntimeError('no weights')"})
+    monkeypatch.setattr(model_loader, "retry_after", lambda: 6.2)
+
+    response = _classify(client, png_bytes())
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "7"
+    assert "no weights" in response.json()["detail"]
+
+
+def test_readyz_starts_the_model_load(client):
+    # WASTE_LOGGER_PRELOAD_MODEL=0: polling the probe alone gets the model loaded
+    deadline = time.monotonic() + 30
+    response = client.get("/readyz")
+    while response.status_code != 200 and time.monotonic() < deadline:
+        time.sleep(0.05)
+        response = client.get("/readyz")
+    assert response.status_code == 200
+    assert response.json()["model_version"] == model_loader.model_version_for(model_loader.model)
+
+
+def test_classify_image(client, model_ready):
+    response = _classify(client, png_bytes())
+    assert response.status_code == 200
+    assert "/static/store/" in response.text
+
+
+def test_classify_rejects_non_images_with_415(client, model_ready):
+    response = _classify(client, b"hello world" * 100, name="notes.txt", content_type="text/plain")
+    assert response.status_code == 415
+
+    # Right magic bytes, undecodable body
+    response = _classify(client, b"\xff\xd8\xff\xe0" + b"garbage" * 50, name="fake.jpg", content_type="image/jpeg")
+    assert response.status_code == 415
+
+
+def test_classify_rejects_oversized_upload_with_413(client, model_ready):
+    # Within the request cap (upload limit + form overhead), caught while reading the upload
+    too_big = b"\xff\xd8\xff" + b"\0" * (uploads.MAX_UPLOAD_BYTES + 1024)
+    response = _classify(client, too_big, name="big.jpg", content_type="image/jpeg")
+    assert response.status_code == 413
+
+    # Past the request cap, refused from Content-Length before the body is parsed
+    far_too_big = b"\xff\xd8\xff" + b"\0" * (uploads.MAX_UPLOAD_BYTES + uploads.FORM_OVERHEAD_BYTES + 1024)
+    response = _classify(client, far_too_big, name="huge.jpg", content_type="image/jpeg")
+    assert response.status_code == 413
+
+
+def test_classify_rejects_decompression_bomb_with_413(client, model_ready):
+    response = _classify(client, _png_header(100000, 100000), name="bomb.png")
+    assert response.status_code == 413
+    assert "too large" in response.json()["detail"]
@@ -0,0 +1,64 @@
+import random
+
+import pytest
+
+from waste_logger_app.utils.hamming_index import MultiIndexHash, hamming
+
+
+def _flip(rng, key, bits, count):
+    for bit in rng.sample(range(bits), count):
+        key ^= 1 << bit
+    return key
+
+
+def _keys(rng, bits, count=2000, centres=20):
+    # Clusters around a few centres, so every distance up to ~10 bits actually occurs
+    seeds = [rng.getrandbits(bits) for _ in range(centres)]
+    return [_flip(rng, rng.choice(seeds), bits, rng.randint(0, 10)) for _ in range(count)]
+
+
+def _linear(keys, query, max_distance):
+    return sorted((hamming(query, key), index) for index, key in enumerate(keys) if hamming(query, key) <= max_distance)
+
+
+@pytest.mark.parametrize("bits", [64, 16])
+@pytest.mark.parametrize("max_distance", [0, 1, 2, 4, 7])
+def test_search_matches_linear_scan(bits, max_distance):
+    rng = random.Random(bits * 100 + max_distance)
+    keys = _keys(rng, bits)
+    table = MultiIndexHash(max_distance, bits=bits)
+    for index, key in enumerate(keys):
+        table.add(key, index)
+    assert len(table) == len(keys)
+
+    queries = [_flip(rng, rng.choice(keys), bits, rng.randint(0, max_distance + 2)) for _ in range(200)]
+    queries += [rng.getrandbits(bits) for _ in range(50)]
+    for query in queries:
+        found = table.search(query)
+        assert sorted(found) == _linear(keys, query, max_distance)
+        assert [distance for distance, _ in found] == sorted(distance for distance, _ in found)
+
+
+def test_search_with_a_smaller_radius():
+    rng = random.Random(7)
+    keys = _keys(rng, 64)
+    table = MultiIndexHash(4)
+    for index, key in enumerate(keys):
+        table.add(key, index)
+    for query in keys[:100]:
+        assert sorted(table.search(query, max_distance=1)) == _linear(keys, query, 1)
+        # Never wider than the radius the table was built for
+        assert sorted(table.search(query, max_distance=9)) == _linear(keys, query, 4)
+
+
+def test_duplicate_keys_keep_every_value():
+    table = MultiIndexHash(2)
+    table.add(0xDEADBEEF, "first")
+    table.add(0xDEADBEEF, "second")
+    assert sorted(table.search(0xDEADBEEF)) == [(0, "first"), (0, "second")]
+
+
+@pytest.mark.parametrize("max_distance", [-1, 64])
+def test_rejects_radius_outside_the_key_width(max_distance):
+    with pytest.raises(ValueError):
+        MultiIndexHash(max_distance)
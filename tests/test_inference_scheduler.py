@@ -0,0 +1,94 @@
+import threading
+import time
+
+import pytest
+
+from waste_logger_app.inference_scheduler import InferenceScheduler
+
+
+class GatedPredict:
+    # predict_batch stand-in: records batch sizes; the first call blocks until released,
+    # so everything submitted meanwhile is queued up behind it
+    def __init__(self, fail=None):
+        self.batches = []
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.fail = fail
+
+    def __call__(self, items):
+        self.batches.append(list(items))
+        if len(self.batches) == 1:
+            self.entered.set()
+            self.release.wait(5)
+        if self.fail is not None:
+            raise self.fail
+        return [item * 10 for item in items]
+
+
+def _block_worker(scheduler, predict):
+    first = scheduler.submit(0)
+    assert predict.entered.wait(5)
+    return first
+
+
+def test_queued_items_coalesce_up_to_max_batch_size():
+    predict = GatedPredict()
+    scheduler = InferenceScheduler(predict, max_batch_size=4, max_wait_ms=50)
+    first = _block_worker(scheduler, predict)
+    futures = [scheduler.submit(i) for i in range(1, 11)]
+    predict.release.set()
+
+    assert first.result(timeout=5) == 0
+    assert [future.result(timeout=5) for future in futures] == [i * 10 for i in range(1, 11)]
+    assert [len(batch) for batch in predict.batches] == [1, 4, 4, 2]
+    assert scheduler.stats()["max_batch_size_seen"] == 4
+
+
+def test_partial_batch_is_flushed_after_max_wait():
+    predict = GatedPredict()
+    predict.release.set()
+    scheduler = InferenceScheduler(predict, max_batch_size=16, max_wait_ms=50)
+    started = time.monotonic()
+    futures = [scheduler.submit(i) for i in range(3)]
+    assert [future.result(timeout=5) for future in futures] == [0, 10, 20]
+    assert time.monotonic() - started < 2
+    assert [len(batch) for batch in predict.batches] == [3]
+
+
+def test_cancelled_futures_are_left_out_of_the_batch():
+    predict = GatedPredict()
+    scheduler = InferenceScheduler(predict, max_batch_size=8, max_wait_ms=20)
+    _block_worker(scheduler, predict)
+    cancelled = scheduler.submit(1)
+    kept = scheduler.submit(2)
+    assert cancelled.cancel()
+    predict.release.set()
+
+    assert kept.result(timeout=5) == 20
+    assert cancelled.cancelled()
+    assert predict.batches[1] == [2]
+
+
+def test_exception_is_set_on_every_future_in_the_batch():
+    error = ValueError("model exploded")
+    predict = GatedPredict(fail=error)
+    scheduler = InferenceScheduler(predict, max_batch_size=8, max_wait_ms=20)
+    first = _block_worker(scheduler, predict)
+    futures = [scheduler.submit(i) for i in range(1, 4)]
+    predict.release.set()
+
+    for future in [first] + futures:
+        with pytest.raises(ValueError, match="model exploded"):
+            future.result(timeout=5)
+    assert [len(batch) for batch in predict.batches] == [1, 3]
+    # The worker survives a failed batch
+    predict.fail = None
+    assert scheduler.submit(5).result(timeout=5) == 50
+
+
+def test_wrong_result_count_fails_the_whole_batch():
+    scheduler = InferenceScheduler(lambda items: items[:-1], max_batch_size=8, max_wait_ms=50)
+    futures = [scheduler.submit(i) for i in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="2 results for 3 items"):
+            future.result(timeout=5)
@@ -0,0 +1,37 @@
+import csv
+
+from waste_logger_app import ingest, waste_logger
+from waste_logger_app.database import SessionLocal, WasteLog
+
+from conftest import png_bytes
+
+
+def test_load_reports_errors_in_their_own_field(tmp_path):
+    good = tmp_path / "good.png"
+    good.write_bytes(png_bytes())
+    bad = tmp_path / "bad.png"
+    bad.write_bytes(b"\x89PNG\r\n\x1a\n truncated")
+
+    loaded = ingest._load(str(good))
+    assert loaded.error is None and loaded.prepared is not None
+    assert loaded.mtime == good.stat().st_mtime
+
+    failed = ingest._load(str(bad))
+    assert failed.prepared is None and failed.mtime is None and failed.error
+
+
+def test_legacy_import_reads_the_given_file(tmp_path):
+    path = tmp_path / "legacy.csv"
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["filename", "label", "material", "recyclable", "co2_kg"])
+        writer.writerow(["", "tin_can", "metal", "True", "0.2"])
+        writer.writerow(["", "envelope", "paper", "False", ""])
+
+    before = waste_logger.WASTE_LOG_PATH
+    assert ingest.import_legacy_csv(str(path), username="legacy-user") == 2
+    assert waste_logger.WASTE_LOG_PATH == before
+
+    with SessionLocal() as db:
+        rows = db.query(WasteLog).filter(WasteLog.username == "legacy-user").order_by(WasteLog.id).all()
+    assert [(row.label, row.recyclable, row.co2_estimate) for row in rows] == [("tin_can", True, 0.2), ("envelope", False, None)]
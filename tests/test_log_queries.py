@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from waste_logger_app import log_queries
+from waste_logger_app.database import SessionLocal, WasteLog
+
+from conftest import png_bytes
+
+
+@pytest.fixture
+def history():
+    # 23 rows for one user, with runs of identical timestamps so pages must break ties on id
+    username = "paging-user"
+    start = datetime(2024, 3, 1, 12, 0, 0)
+    with SessionLocal() as db:
+        db.query(WasteLog).filter(WasteLog.username == username).delete()
+        db.add_all([
+            WasteLog(
+                label=f"item_{i}",
+                confidence=0.9,
+                material="plastic" if i % 2 else "glass",
+                recyclable=bool(i % 3),
+                co2_estimate=0.1,
+                username=username,
+                timestamp=start + timedelta(minutes=i // 4),
+            )
+            for i in range(23)
+        ])
+        db.commit()
+        expected = [
+            entry.id for entry in db.query(WasteLog)
+            .filter(WasteLog.username == username)
+            .order_by(WasteLog.timestamp.desc(), WasteLog.id.desc())
+        ]
+    return username, expected
+
+
+def _walk(username, limit, filters=log_queries.NO_FILTERS):
+    seen, cursor = [], None
+    with SessionLocal() as db:
+        while True:
+            rows, cursor = log_queries.fetch_page(db, username, filters, cursor=cursor, limit=limit)
+            seen.extend(entry.id for entry in rows)
+            if cursor is None:
+                return seen
+
+
+@pytest.mark.parametrize("limit", [1, 4, 5, 22, 23, 50])
+def test_pages_cover_every_row_once_in_order(history, limit):
+    username, expected = history
+    assert _walk(username, limit) == expected
+
+
+def test_pages_respect_filters(history):
+    username, _ = history
+    filters = log_queries.LogFilters(None, None, "plastic", None)
+    with SessionLocal() as db:
+        expected = [
+            entry.id for entry in db.query(WasteLog)
+            .filter(WasteLog.username == username, WasteLog.material == "plastic")
+            .order_by(WasteLog.timestamp.desc(), WasteLog.id.desc())
+        ]
+    assert _walk(username, 3, filters) == expected
+
+
+def test_cursor_round_trip():
+    entry = WasteLog(id=42, timestamp=datetime(2024, 3, 1, 12, 30, 15, 250000))
+    assert log_queries.decode_cursor(log_queries.encode_cursor(entry)) == (entry.timestamp, 42)
+
+
+@pytest.mark.parametrize("cursor", ["", "not-a-cursor", "bm9waXBl", "MjAyNC0wMy0wMXw="])
+def test_decode_cursor_rejects_garbage(cursor):
+    with pytest.raises(ValueError):
+        log_queries.decode_cursor(cursor)
+
+
+def test_api_log_follows_next_cursor(client, model_ready):
+    # Entries this test adds through /classify, walked back page by page over HTTP
+    for shade in range(5):
+        response = client.post("/classify", files={"file": ("p.png", png_bytes(color=(shade * 40, 10, 10)), "image/png")})
+        assert response.status_code == 200
+
+    with SessionLocal() as db:
+        expected = [
+            entry.id for entry in db.query(WasteLog)
+            .filter(WasteLog.username == "tester")
+            .order_by(WasteLog.timestamp.desc(), WasteLog.id.desc())
+        ]
+
+    seen, params = [], {"limit": 2}
+    while True:
+        page = client.get("/api/log", params=params).json()
+        seen.extend(item["id"] for item in page["items"])
+        if page["next_cursor"] is None:
+            break
+        params = {"limit": 2, "cursor": page["next_cursor"]}
+    assert seen == expected
+    assert client.get("/api/log", params={"cursor": "not-a-cursor"}).status_code == 400
@@ -0,0 +1,28 @@
+from types import SimpleNamespace
+
+import numpy as np
+
+from waste_logger_app import inference_backends, model_loader, pipeline
+
+
+def test_version_changes_with_the_artifact(tmp_path):
+    path = tmp_path / "model.onnx"
+    path.write_bytes(b"weights v1")
+    first = model_loader.model_version_for(SimpleNamespace(name="onnx", artifact_digest=inference_backends.file_digest(path)))
+    path.write_bytes(b"weights v2")
+    second = model_loader.model_version_for(SimpleNamespace(name="onnx", artifact_digest=inference_backends.file_digest(path)))
+    assert first != second
+    assert first.startswith(f"{model_loader.BASE_MODEL_VERSION}-onnx-")
+
+
+def test_weights_digest_is_content_based():
+    weights = [np.arange(6, dtype=np.float32).reshape(2, 3), np.ones(3, dtype=np.float32)]
+    before = inference_backends.weights_digest(weights)
+    assert inference_backends.weights_digest([w.copy() for w in weights]) == before
+    weights[1][0] = 2.0
+    assert inference_backends.weights_digest(weights) != before
+
+
+def test_version_is_published_when_the_model_loads(model_ready):
+    assert model_loader.MODEL_VERSION == model_loader.model_version_for(model_loader.model)
+    assert pipeline.result_cache.model_version == pipeline.near_duplicates.model_version == model_loader.MODEL_VERSION
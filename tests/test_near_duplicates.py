@@ -0,0 +1,49 @@
+import io
+
+import numpy as np
+from PIL import Image
+
+from waste_logger_app import near_duplicates, pipeline, preprocessing
+
+from conftest import png_bytes
+
+
+def _textured(seed, fmt="PNG", quality=95):
+    # Smooth random blobs: plenty of edges, and stable under recompression
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 256, size=(12, 16, 3), dtype=np.uint8)
+    image = Image.fromarray(small).resize((320, 240), Image.BICUBIC)
+    buffer = io.BytesIO()
+    image.save(buffer, format=fmt, quality=quality)
+    return buffer.getvalue()
+
+
+def _classify(client, contents, name):
+    response = client.post("/classify", files={"file": (name, contents, "image/png")})
+    assert response.status_code == 200
+    return response
+
+
+def test_flat_images_are_not_informative():
+    red = preprocessing.prepare_image(png_bytes(color=(220, 30, 30))).dhash
+    blue = preprocessing.prepare_image(png_bytes(color=(30, 30, 220))).dhash
+    assert red == blue  # the reason for the check: no edges, same hash
+    assert not near_duplicates.informative(red)
+    assert near_duplicates.informative(preprocessing.prepare_image(_textured(1)).dhash)
+
+
+def test_distinct_solid_colours_are_not_near_duplicates(client, model_ready):
+    before = pipeline.near_duplicates.stats()
+    _classify(client, png_bytes(size=(80, 60), color=(200, 40, 40)), "red.png")
+    _classify(client, png_bytes(size=(80, 60), color=(40, 40, 200)), "blue.png")
+    after = pipeline.near_duplicates.stats()
+    assert after["hits"] == before["hits"]
+    assert after["low_information"] == before["low_information"] + 2
+    assert after["entries"] == before["entries"]
+
+
+def test_recompressed_upload_reuses_the_prediction(client, model_ready):
+    before = pipeline.near_duplicates.stats()["hits"]
+    _classify(client, _textured(2), "original.png")
+    _classify(client, _textured(2, fmt="JPEG", quality=80), "recompressed.jpg")
+    assert pipeline.near_duplicates.stats()["hits"] == before + 1
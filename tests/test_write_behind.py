@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from waste_logger_app.write_behind import WriteBehindQueue
+
+
+class RecordingWriter:
+    # write_rows stand-in: records each transaction, optionally blocking or failing
+    def __init__(self, fail_on=None):
+        self.transactions = []
+        self.fail_on = fail_on
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, rows):
+        self.release.wait(5)
+        if self.fail_on is not None and self.fail_on in rows:
+            raise ValueError(f"bad row {self.fail_on}")
+        self.transactions.append(list(rows))
+
+
+def test_concurrent_submissions_share_one_commit():
+    writer = RecordingWriter()
+    log_writer = WriteBehindQueue(writer, max_rows=100, max_delay_ms=200)
+    futures = [log_writer.submit([i]) for i in range(10)]
+    assert [future.result(timeout=5) for future in futures] == [1] * 10
+    assert writer.transactions == [list(range(10))]
+    assert log_writer.stats()["commits"] == 1
+    log_writer.close()
+
+
+def test_group_flushes_at_max_rows_without_waiting_for_the_delay():
+    writer = RecordingWriter()
+    log_writer = WriteBehindQueue(writer, max_rows=4, max_delay_ms=10000)
+    started = time.monotonic()
+    futures = [log_writer.submit([i, i]) for i in range(2)]
+    for future in futures:
+        future.result(timeout=5)
+    assert time.monotonic() - started < 5
+    assert writer.transactions == [[0, 0, 1, 1]]
+    log_writer.close()
+
+
+def test_group_flushes_after_the_delay():
+    writer = RecordingWriter()
+    log_writer = WriteBehindQueue(writer, max_rows=1000, max_delay_ms=20)
+    assert log_writer.submit(["only"]).result(timeout=5) == 1
+    assert writer.transactions == [["only"]]
+    log_writer.close()
+
+
+def test_rows_queued_behind_a_slow_commit_are_grouped():
+    writer = RecordingWriter()
+    log_writer = WriteBehindQueue(writer, max_rows=100, max_delay_ms=0)
+    writer.release.clear()
+    first = log_writer.submit(["a"])
+    time.sleep(0.05)  # writer thread is now blocked inside the first commit
+    rest = [log_writer.submit([name]) for name in ("b", "c", "d")]
+    writer.release.set()
+    for future in [first] + rest:
+        future.result(timeout=5)
+    assert writer.transactions == [["a"], ["b", "c", "d"]]
+    log_writer.close()
+
+
+def test_failed_group_is_retried_per_submission():
+    writer = RecordingWriter(fail_on="bad")
+    log_writer = WriteBehindQueue(writer, max_rows=100, max_delay_ms=100)
+    good = log_writer.submit(["ok-1"])
+    bad = log_writer.submit(["bad"])
+    other = log_writer.submit(["ok-2", "ok-3"])
+    assert good.result(timeout=5) == 1
+    assert other.result(timeout=5) == 2
+    with pytest.raises(ValueError):
+        bad.result(timeout=5)
+    assert writer.transactions == [["ok-1"], ["ok-2", "ok-3"]]
+    assert log_writer.stats()["failures"] == 1
+    log_writer.close()
+
+
+def test_close_flushes_queued_rows_and_rejects_new_ones():
+    writer = RecordingWriter()
+    log_writer = WriteBehindQueue(writer, max_rows=100, max_delay_ms=10000)
+    futures = [log_writer.submit([i]) for i in range(3)]
+    log_writer.close(timeout=5)
+    assert [future.result(timeout=0) for future in futures] == [1, 1, 1]
+    assert sum(writer.transactions, []) == [0, 1, 2]
+    with pytest.raises(RuntimeError):
+        log_writer.submit([3]).result(timeout=0)
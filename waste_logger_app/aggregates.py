@@ -0,0 +1,252 @@
+# waste_logger_app/aggregates.py
+#
+# Incrementally maintained aggregates over waste_logs. Inserts go through
+# record_waste_logs so user_stats and daily_rollups are updated in the same
+# transaction.
+#
+# Rebuild from the raw logs with:
+#     python -m waste_logger_app.aggregates rebuild
+
+import argparse
+from collections import defaultdict
+
+from sqlalchemy import case, func, insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from waste_logger_app.database import SessionLocal, UserStats, DailyRollup, WasteLog, engine
+from waste_logger_app.models.user import User
+
+# The increments below are upserts. SQLite and PostgreSQL share the
+# ON CONFLICT ... DO UPDATE form (and name the two-argument maximum differently);
+# other databases are refused at startup by check_dialect().
+UPSERT_INSERTS = {"sqlite": sqlite_insert, "postgresql": postgresql_insert}
+_GREATEST = {"sqlite": "max", "postgresql": "greatest"}
+
+
+def check_dialect(bind=engine):
+    if bind.dialect.name not in UPSERT_INSERTS:
+        raise RuntimeError(
+            f"waste_logs aggregates need SQLite or PostgreSQL, not {bind.dialect.name} "
+            "(see UPSERT_INSERTS in waste_logger_app/aggregates.py)"
+        )
+
+
+def _stats_deltas(entries):
+    deltas = defaultdict(lambda: {"entry_count": 0, "recyclable_count": 0, "total_co2": 0.0, "last_activity": None})
+    for entry in entries:
+        d = deltas[entry.username]
+        d["entry_count"] += 1
+        d["recyclable_count"] += 1 if entry.recyclable else 0
+        d["total_co2"] += entry.co2_estimate or 0.0
+        if entry.timestamp and (d["last_activity"] is None or entry.timestamp > d["last_activity"]):
+            d["last_activity"] = entry.timestamp
+    return deltas
+
+
+def _rollup_deltas(entries):
+    deltas = defaultdict(lambda: {"co2_total": 0.0, "entries": 0, "recyclable": 0})
+    for entry in entries:
+        d = deltas[(entry.username, entry.timestamp.date())]
+        d["co2_total"] += entry.co2_estimate or 0.0
+        d["entries"] += 1
+        d["recyclable"] += 1 if entry.recyclable else 0
+    return deltas
+
+
+def upsert_statements(dialect, entries):
+    # One upsert per touched user_stats and daily_rollups row, for `dialect`
+    upsert = UPSERT_INSERTS[dialect]
+    greatest = getattr(func, _GREATEST[dialect])
+    for username, d in _stats_deltas(entries).items():
+        stmt = upsert(UserStats).values(username=username, **d)
+        yield stmt.on_conflict_do_update(
+            index_elements=[UserStats.username],
+            set_={
+                "entry_count": UserStats.entry_count + stmt.excluded.entry_count,
+                "recyclable_count": UserStats.recyclable_count + stmt.excluded.recyclable_count,
+                "total_co2": UserStats.total_co2 + stmt.excluded.total_co2,
+                "last_activity": greatest(
+                    func.coalesce(UserStats.last_activity, stmt.excluded.last_activity),
+                    func.coalesce(stmt.excluded.last_activity, UserStats.last_activity),
+                ),
+            },
+        )
+
+    for (username, day), d in _rollup_deltas(entries).items():
+        stmt = upsert(DailyRollup).values(username=username, day=day, **d)
+        yield stmt.on_conflict_do_update(
+            index_elements=[DailyRollup.username, DailyRollup.day],
+            set_={
+                "co2_total": DailyRollup.co2_total + stmt.excluded.co2_total,
+                "entries": DailyRollup.entries + stmt.excluded.entries,
+                "recyclable": DailyRollup.recyclable + stmt.excluded.recyclable,
+            },
+        )
+
+
+def record_waste_logs(db, entries):
+    # Add WasteLog rows and fold them into user_stats and daily_rollups; the caller commits
+    entries = list(entries)
+    if not entries:
+        return entries
+    db.add_all(entries)
+    db.flush()  # fills in column defaults such as timestamp
+
+    for stmt in upsert_statements(db.get_bind().dialect.name, entries):
+        db.execute(stmt)
+    return entries
+
+
+def user_dashboard(db, username, recent_limit=5):
+    # Totals from user_stats, trend from daily_rollups, recent items via LIMIT:
+    # cost does not grow with the length of the user's history
+    stats = db.get(UserStats, username) if username else None
+    total_entries = stats.entry_count if stats else 0
+    total_co2 = stats.total_co2 if stats else 0.0
+    recyclable_count = stats.recyclable_count if stats else 0
+
+    co2_trend = {
+        day.strftime("%Y-%m-%d"): co2
+        for day, co2 in db.query(DailyRollup.day, DailyRollup.co2_total)
+        .filter(DailyRollup.username == username)
+        .order_by(DailyRollup.day)
+    }
+
+    recent = (
+        db.query(WasteLog)
+        .filter(WasteLog.username == username)
+        .order_by(WasteLog.timestamp.desc(), WasteLog.id.desc())
+        .limit(recent_limit)
+        .all()
+    )
+    recent.reverse()  # oldest first, like the full log used to be
+
+    return {
+        "total_co2": total_co2,
+        "total_entries": total_entries,
+        "percent_recyclable": (recyclable_count / total_entries * 100) if total_entries else 0,
+        "co2_trend": co2_trend,
+        "recent_logs": recent,
+    }
+
+
+def user_totals(db, username, days=()):
+    # Current totals plus the trend points for `days`, for live dashboard updates
+    stats = db.get(UserStats, username)
+    total_entries = stats.entry_count if stats else 0
+    trend = {}
+    if days:
+        trend = {
+            day.strftime("%Y-%m-%d"): co2
+            for day, co2 in db.query(DailyRollup.day, DailyRollup.co2_total)
+            .filter(DailyRollup.username == username, DailyRollup.day.in_(sorted(days)))
+            .order_by(DailyRollup.day)
+        }
+    return {
+        "total_co2": round(stats.total_co2 if stats else 0.0, 2),
+        "total_entries": total_entries,
+        "percent_recyclable": round(stats.recyclable_count / total_entries * 100, 2) if total_entries else 0,
+        "co2_trend": trend,
+    }
+
+
+def leaderboard(db):
+    # One ordered query over users LEFT JOIN user_stats
+    entries = func.coalesce(UserStats.entry_count, 0)
+    total_co2 = func.coalesce(UserStats.total_co2, 0.0)
+    recyclable_percent = case(
+        (entries > 0, func.coalesce(UserStats.recyclable_count, 0) * 100.0 / entries),
+        else_=0.0,
+    )
+    rows = (
+        db.query(User.username, total_co2, recyclable_percent, entries)
+        .outerjoin(UserStats, UserStats.username == User.username)
+        .order_by(func.round(total_co2, 2), func.round(recyclable_percent, 2).desc(), User.username)
+        .all()
+    )
+    return [
+        {
+            "username": username,
+            "total_co2": round(co2, 2),
+            "recyclable_percent": round(percent, 2),
+            "total_entries": count,
+        }
+        for username, co2, percent, count in rows
+    ]
+
+
+def rebuild_user_stats(db):
+    # Recompute user_stats from the raw logs; the caller commits
+    db.query(UserStats).delete(synchronize_session=False)
+    select = db.query(
+        WasteLog.username,
+        func.count(WasteLog.id),
+        func.sum(case((WasteLog.recyclable, 1), else_=0)),
+        func.coalesce(func.sum(WasteLog.co2_estimate), 0.0),
+        func.max(WasteLog.timestamp),
+    ).group_by(WasteLog.username)
+    db.execute(
+        insert(UserStats).from_select(
+            ["username", "entry_count", "recyclable_count", "total_co2", "last_activity"],
+            select,
+        )
+    )
+
+
+def rebuild_daily_rollups(db):
+    # Recompute daily_rollups from the raw logs; the caller commits
+    db.query(DailyRollup).delete(synchronize_session=False)
+    day = func.date(WasteLog.timestamp)
+    select = db.query(
+        WasteLog.username,
+        day,
+        func.coalesce(func.sum(WasteLog.co2_estimate), 0.0),
+        func.count(WasteLog.id),
+        func.sum(case((WasteLog.recyclable, 1), else_=0)),
+    ).group_by(WasteLog.username, day)
+    db.execute(
+        insert(DailyRollup).from_select(
+            ["username", "day", "co2_total", "entries", "recyclable"],
+            select,
+        )
+    )
+
+
+def ensure_indexes():
+    # create_all only adds indexes for new tables; add them to existing ones too
+    for index in WasteLog.__table__.indexes:
+        index.create(bind=engine, checkfirst=True)
+
+
+def ensure_aggregates(db):
+    # First start after upgrading: backfill the aggregate tables once
+    if db.query(WasteLog.id).first() is None:
+        return
+    if db.query(UserStats.username).first() is None:
+        rebuild_user_stats(db)
+    if db.query(DailyRollup.username).first() is None:
+        rebuild_daily_rollups(db)
+    db.commit()
+
+
+def rebuild():
+    db = SessionLocal()
+    try:
+        rebuild_user_stats(db)
+        rebuild_daily_rollups(db)
+        db.commit()
+        print(
+            f"Rebuilt stats for {db.query(UserStats).count()} users "
+            f"and {db.query(DailyRollup).count()} daily rollups."
+        )
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Maintain waste log aggregates")
+    parser.add_argument("command", choices=["rebuild"])
+    args = parser.parse_args()
+    if args.command == "rebuild":
+        rebuild()
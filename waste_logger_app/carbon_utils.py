@@ -1,24 +1,150 @@
-import pandas as pd
+import csv
 import os
+import threading
+from collections import namedtuple
+
+import numpy as np
 
 CARBON_TABLE_PATH = os.path.join(os.path.dirname(__file__), "carbon_table.csv")
 
+# Returned when a label is not in the table
+UNKNOWN_IMPACT = ("unknown", False, 0.05)
+
+CarbonEntry = namedtuple("CarbonEntry", ["material", "recyclable", "co2_kg"])
+
+
+def normalize_label(label):
+    return " ".join(str(label).replace("_", " ").replace("-", " ").lower().split())
+
+
+def _parse_bool(value):
+    return str(value).strip().lower() in ("true", "1", "yes")
+
+
+class CarbonIndex:
+    # Immutable label -> CarbonEntry lookup compiled from carbon_table.csv
+
+    def __init__(self, entries, mtime=None):
+        # Labels match after normalize_label (case, "_"/"-" vs. spaces). Other
+        # names for an item belong in carbon_table.csv as rows of their own,
+        # where a change in CO2 accounting is visible and reviewable.
+        self._table = {normalize_label(label): entry for label, entry in entries.items()}
+        self.mtime = mtime
+
+    @classmethod
+    def from_csv(cls, path=CARBON_TABLE_PATH):
+        mtime = os.path.getmtime(path)
+        entries = {}
+        with open(path, newline="") as file:
+            for row in csv.DictReader(file):
+                # First row wins, matching the old first-match DataFrame filter
+                entries.setdefault(row["label"], CarbonEntry(
+                    row["material"], _parse_bool(row["recyclable"]), float(row["co2_kg"])
+                ))
+        return cls(entries, mtime=mtime)
+
+    def lookup(self, label):
+        entry = self._table.get(normalize_label(label))
+        return tuple(entry) if entry is not None else UNKNOWN_IMPACT
+
+    def lookup_many(self, labels):
+        table = self._table
+        results = []
+        for label in labels:
+            entry = table.get(normalize_label(label))
+            results.append(tuple(entry) if entry is not None else UNKNOWN_IMPACT)
+        return results
+
+    def __contains__(self, label):
+        return normalize_label(label) in self._table
+
+    def __len__(self):
+        return len(self._table)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index(path=CARBON_TABLE_PATH):
+    # Shared index, rebuilt when carbon_table.csv changes on disk
+    global _index
+    mtime = os.path.getmtime(path)
+    index = _index
+    if index is None or index.mtime != mtime:
+        with _index_lock:
+            if _index is None or _index.mtime != mtime:
+                _index = CarbonIndex.from_csv(path)
+            index = _index
+    return index
+
+
+class ClassCarbonVectors:
+    # Dense per-class arrays aligned with the model's output indices, so carbon
+    # estimation is a vectorized operation on the softmax output.
+
+    def __init__(self, class_names, index):
+        self.source = class_names
+        self.class_names = list(class_names)
+        self.index = index
+        impacts = index.lookup_many(self.class_names)
+
+        self.materials = sorted({material for material, _, _ in impacts} | {UNKNOWN_IMPACT[0]})
+        material_ids = {material: i for i, material in enumerate(self.materials)}
+        self.material_id = np.array([material_ids[m] for m, _, _ in impacts], dtype=np.int16)
+        self.recyclable = np.array([r for _, r, _ in impacts], dtype=bool)
+        self.co2_kg = np.array([c for _, _, c in impacts], dtype=np.float32)
+
+    def top_k(self, probs, top_k=5):
+        # -> (class ids, probabilities) of each row's top-k classes, best first.
+        # This is the model output the caches keep; see impact() for the carbon fields.
+        probs = np.asarray(probs, dtype=np.float32)
+        top_k = max(1, min(int(top_k), probs.shape[1]))
+        top = np.argpartition(probs, -top_k, axis=1)[:, -top_k:]
+        weights = np.take_along_axis(probs, top, axis=1)
+        order = np.argsort(-weights, axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(weights, order, axis=1)
+
+    def impact(self, classes, probs):
+        # -> (material, recyclable, co2_kg) for one row of top_k(): material and
+        # recyclability of the best class, CO2 weighted over all of them
+        classes = np.asarray(classes, dtype=np.intp)
+        weights = np.asarray(probs, dtype=np.float32)
+        total = float(weights.sum()) or 1.0
+        best = classes[0]
+        return (
+            self.materials[self.material_id[best]],
+            bool(self.recyclable[best]),
+            round(float((weights * self.co2_kg[classes]).sum()) / total, 4),
+        )
+
+
+_vectors = None
+
+
+def get_class_vectors(class_names):
+    # Rebuilt whenever the shared index is (i.e. when the CSV changes)
+    global _vectors
+    index = get_index()
+    vectors = _vectors
+    if vectors is None or vectors.index is not index or vectors.source is not class_names:
+        vectors = _vectors = ClassCarbonVectors(class_names, index)
+    return vectors
+
 
 def load_carbon_table():
-    return pd.read_csv(CARBON_TABLE_PATH)
+    return get_index()
+
+def estimate_impact(label, carbon_index=None):
+    # carbon_index is kept for older callers; the shared index is used when omitted
+    index = carbon_index if isinstance(carbon_index, CarbonIndex) else get_index()
+    return index.lookup(label)
 
-def estimate_impact(label, carbon_df):
-    row = carbon_df[carbon_df["label"] == label]
-    if row.empty:
-        return ("unknown", False, 0.05)
-    material = row.iloc[0]["material"]
-    recyclable = row.iloc[0]["recyclable"]
-    co2_kg = row.iloc[0]["co2_kg"]
-    return material, recyclable, co2_kg
+def estimate_impact_many(labels):
+    return get_index().lookup_many(labels)
 
 def get_item_data(label):
-    carbon_df = load_carbon_table()
-    material, recyclable, co2_kg = estimate_impact(label, carbon_df)
+    material, recyclable, co2_kg = estimate_impact(label)
     return {
         "material": material,
         "recyclable": recyclable,
@@ -0,0 +1,137 @@
+# waste_logger_app/classification_cache.py
+#
+# Two-tier cache of classification results keyed by the SHA-256 of the
+# uploaded bytes: an in-process LRU in front of the classification_cache
+# table. Entries are tied to a model version and ignored once it changes.
+#
+# Only the model output is cached - (label, confidence, top_classes, top_probs),
+# see model_loader.ModelOutput - never the carbon fields: those depend on
+# carbon_table.csv and are recomputed by model_loader.estimate on every hit.
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+from waste_logger_app.database import SessionLocal, ClassificationCacheEntry
+
+MEMORY_ENTRIES = int(os.environ.get("WASTE_LOGGER_CACHE_ENTRIES", "10000"))
+
+
+def content_hash(contents):
+    return hashlib.sha256(contents).hexdigest()
+
+
+def encode_top(top_classes, top_probs):
+    return " ".join(f"{class_id}:{prob:.6g}" for class_id, prob in zip(top_classes, top_probs))
+
+
+def decode_top(text):
+    # -> (top_classes, top_probs) tuples, as encode_top got them
+    pairs = [pair.split(":") for pair in text.split()]
+    return tuple(int(class_id) for class_id, _ in pairs), tuple(float(prob) for _, prob in pairs)
+
+
+class LRUCache:
+    def __init__(self, max_entries, lock=None):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = lock or threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class ClassificationCache:
+    def __init__(self, model_version, max_entries=MEMORY_ENTRIES, session_factory=SessionLocal):
+        self.model_version = model_version
+        # One lock for the LRU and the hit/miss counters: get/put run on several executor threads
+        self._lock = threading.Lock()
+        self.memory = LRUCache(max_entries, lock=self._lock)
+        self.session_factory = session_factory
+        self.hits = 0
+        self.misses = 0
+
+    def get_memory(self, key):
+        # Non-blocking: safe to call from the event loop
+        value = self.memory.get(key)
+        if value is not None:
+            with self._lock:
+                self.hits += 1
+        return value
+
+    def get(self, key):
+        # Memory first, then the persistent table (blocking: run on the db executor)
+        value = self.get_memory(key)
+        if value is not None:
+            return value
+
+        db = self.session_factory()
+        try:
+            row = db.get(ClassificationCacheEntry, key)
+            if row is None or row.model_version != self.model_version:
+                with self._lock:
+                    self.misses += 1
+                return None
+            value = (row.label, row.confidence, *decode_top(row.top_classes))
+        finally:
+            db.close()
+
+        with self._lock:
+            self.hits += 1
+        self.memory.put(key, value)
+        return value
+
+    def put(self, key, output):
+        # output: (label, confidence, top_classes, top_probs)
+        label, confidence, top_classes, top_probs = output
+        self.memory.put(key, (label, confidence, tuple(top_classes), tuple(top_probs)))
+        db = self.session_factory()
+        try:
+            db.merge(ClassificationCacheEntry(
+                content_hash=key,
+                model_version=self.model_version,
+                label=label,
+                confidence=confidence,
+                top_classes=encode_top(top_classes, top_probs),
+            ))
+            db.commit()
+        finally:
+            db.close()
+
+    def purge_stale(self):
+        # Drop persistent entries produced by any other model version
+        self.memory.clear()
+        db = self.session_factory()
+        try:
+            deleted = (
+                db.query(ClassificationCacheEntry)
+                .filter(ClassificationCacheEntry.model_version != self.model_version)
+                .delete(synchronize_session=False)
+            )
+            db.commit()
+            return deleted
+        finally:
+            db.close()
+
+    def stats(self):
+        with self._lock:
+            return {"memory_entries": len(self.memory), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,83 @@
+# waste_logger_app/concurrency.py
+#
+# Execution model for request handlers: CPU-bound work (image decode/encode)
+# and blocking database writes run on their own pools so the asyncio event
+# loop stays free, and /classify admission is capped. bcrypt runs in a small
+# process pool so a burst of logins cannot starve the request threadpool.
+
+import asyncio
+import contextvars
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+
+from fastapi import HTTPException
+
+CPU_WORKERS = int(os.environ.get("WASTE_LOGGER_CPU_WORKERS", str(os.cpu_count() or 2)))
+DB_WORKERS = int(os.environ.get("WASTE_LOGGER_DB_WORKERS", "2"))
+MAX_INFLIGHT_CLASSIFY = int(os.environ.get("WASTE_LOGGER_MAX_INFLIGHT_CLASSIFY", "32"))
+RETRY_AFTER_SECONDS = int(os.environ.get("WASTE_LOGGER_RETRY_AFTER", "2"))
+AUTH_WORKERS = int(os.environ.get("WASTE_LOGGER_AUTH_WORKERS", "2"))
+MAX_INFLIGHT_AUTH = int(os.environ.get("WASTE_LOGGER_MAX_INFLIGHT_AUTH", str(AUTH_WORKERS * 8)))
+
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_WORKERS, thread_name_prefix="cpu")
+db_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+# Worker processes start on first use. Spawned rather than forked: by then the
+# parent runs executor, model-loader and writer threads whose locks a fork
+# could copy mid-acquire, and the workers only need passlib.
+auth_executor = ProcessPoolExecutor(max_workers=AUTH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+
+
+async def run_cpu(fn, *args, **kwargs):
+    # Context is carried over so metrics timers attribute stages to the request
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(cpu_executor, partial(contextvars.copy_context().run, fn, *args, **kwargs))
+
+
+async def run_db(fn, *args, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, partial(contextvars.copy_context().run, fn, *args, **kwargs))
+
+
+async def run_auth(fn, *args, **kwargs):
+    # fn and its arguments must be picklable (module-level functions)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(auth_executor, partial(fn, *args, **kwargs))
+
+
+class AdmissionLimiter:
+    # Only touched from the event loop, so a plain counter is enough.
+    def __init__(self, limit, retry_after=RETRY_AFTER_SECONDS):
+        self.limit = limit
+        self.retry_after = retry_after
+        self.inflight = 0
+        self.rejected = 0
+
+    def acquire(self):
+        # Raises 503 when full; pair with release() (or use slot())
+        if self.inflight >= self.limit:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Server busy, please retry shortly",
+                headers={"Retry-After": str(self.retry_after)},
+            )
+        self.inflight += 1
+
+    def release(self):
+        self.inflight -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+
+classify_admission = AdmissionLimiter(MAX_INFLIGHT_CLASSIFY)
+# Bounds the bcrypt queue; beyond it logins get a 503 instead of waiting
+auth_admission = AdmissionLimiter(MAX_INFLIGHT_AUTH)
@@ -0,0 +1,167 @@
+# waste_logger_app/convert_model.py
+#
+# Build the TFLite / ONNX models used by inference_backends.py from the Keras
+# MobileNetV2, then check them against Keras top-1 labels.
+#
+#   python -m waste_logger_app.convert_model tflite --quantization dynamic
+#   python -m waste_logger_app.convert_model tflite --quantization int8
+#   python -m waste_logger_app.convert_model onnx
+#   python -m waste_logger_app.convert_model check tflite --model models_bin/mobilenet_v2_int8.tflite
+#
+# Conversion needs TensorFlow (and tf2onnx for ONNX); serving a converted
+# model only needs tflite-runtime or onnxruntime.
+
+import argparse
+import hashlib
+import os
+import shutil
+import sys
+
+import numpy as np
+
+from waste_logger_app import inference_backends, model_loader
+from waste_logger_app.preprocessing import prepare_image
+
+DEFAULT_IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static")
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp")
+
+
+def load_sample_batch(image_dir=DEFAULT_IMAGE_DIR, limit=200):
+    # Preprocessed float32 batch from real uploads, for calibration and checks
+    arrays, seen = [], set()
+    for dirpath, _, filenames in os.walk(image_dir):
+        for name in sorted(filenames):
+            if not name.lower().endswith(IMAGE_SUFFIXES):
+                continue
+            with open(os.path.join(dirpath, name), "rb") as f:
+                contents = f.read()
+            digest = hashlib.sha256(contents).digest()
+            if digest in seen:
+                continue
+            seen.add(digest)
+            try:
+                arrays.append(prepare_image(contents).array)
+            except OSError:
+                continue
+            if len(arrays) >= limit:
+                break
+    if not arrays:
+        raise SystemExit(f"No usable images found under {image_dir}")
+    return model_loader.preprocess_input(np.stack(arrays))
+
+
+def _keras_model():
+    from tensorflow.keras.applications import MobileNetV2
+
+    return MobileNetV2(weights=model_loader.WEIGHTS_PATH or "imagenet")
+
+
+def _copy_class_index():
+    # Lets TFLite/ONNX hosts resolve labels without TensorFlow installed
+    target = os.path.join(inference_backends.MODELS_DIR, "imagenet_class_index.json")
+    source = model_loader._class_index_path()
+    if source is None:
+        model_loader.load_class_names()  # downloads into the Keras cache
+        source = model_loader._class_index_path()
+    if source and os.path.abspath(source) != os.path.abspath(target):
+        shutil.copyfile(source, target)
+
+
+def convert_tflite(output, quantization, image_dir):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(_keras_model())
+    if quantization in ("dynamic", "int8"):
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    if quantization == "int8":
+        # Full integer quantization: calibrate activations on real uploads.
+        # Input/output stay float32; TFLiteBackend also handles int8 I/O models.
+        samples = load_sample_batch(image_dir, limit=100)
+
+        def representative_dataset():
+            for sample in samples:
+                yield [sample[np.newaxis, ...]]
+
+        converter.representative_dataset = representative_dataset
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    with open(output, "wb") as f:
+        f.write(converter.convert())
+
+
+def convert_onnx(output):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, 224, 224, 3), tf.float32, name="input"),)
+    tf2onnx.convert.from_keras(_keras_model(), input_signature=spec, opset=13, output_path=output)
+
+
+def check(backend_name, model_path, image_dir, min_agreement):
+    # Top-1 agreement with Keras on the same preprocessed images
+    batch = load_sample_batch(image_dir)
+    reference = inference_backends.create_backend("keras", weights_path=model_loader.WEIGHTS_PATH)
+    candidate = inference_backends.create_backend(backend_name, model_path=model_path)
+
+    expected = np.concatenate([reference.predict(batch[i:i + 16]) for i in range(0, len(batch), 16)])
+    actual = np.concatenate([candidate.predict(batch[i:i + 16]) for i in range(0, len(batch), 16)])
+
+    agreement = float((expected.argmax(axis=1) == actual.argmax(axis=1)).mean())
+    max_abs_diff = float(np.abs(expected - actual).max())
+    size_mb = os.path.getsize(model_path) / (1024 * 1024)
+    print(
+        f"{backend_name}: top-1 agreement {agreement:.1%} on {len(batch)} images, "
+        f"max |p - p_keras| {max_abs_diff:.4f}, model size {size_mb:.1f} MB"
+    )
+    if agreement < min_agreement:
+        print(f"FAILED: agreement below {min_agreement:.1%}")
+        return False
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert MobileNetV2 for the TFLite/ONNX backends")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    tflite = sub.add_parser("tflite")
+    tflite.add_argument("--quantization", choices=["none", "dynamic", "int8"], default="dynamic")
+    tflite.add_argument("--output")
+
+    onnx = sub.add_parser("onnx")
+    onnx.add_argument("--output", default=inference_backends.DEFAULT_ONNX_PATH)
+
+    checker = sub.add_parser("check")
+    checker.add_argument("backend", choices=["tflite", "onnx"])
+    checker.add_argument("--model", required=True)
+
+    for command in (tflite, onnx, checker):
+        command.add_argument("--images", default=DEFAULT_IMAGE_DIR, help="images for calibration/checking")
+        command.add_argument("--min-agreement", type=float, default=0.95)
+    for command in (tflite, onnx):
+        command.add_argument("--skip-check", action="store_true")
+
+    args = parser.parse_args()
+    os.makedirs(inference_backends.MODELS_DIR, exist_ok=True)
+
+    if args.command == "tflite":
+        output = args.output or os.path.join(
+            inference_backends.MODELS_DIR, f"mobilenet_v2_{args.quantization}.tflite"
+        )
+        convert_tflite(output, args.quantization, args.images)
+        backend_name, model_path = "tflite", output
+    elif args.command == "onnx":
+        convert_onnx(args.output)
+        backend_name, model_path = "onnx", args.output
+    else:
+        backend_name, model_path = args.backend, args.model
+
+    if args.command != "check":
+        _copy_class_index()
+        print(f"Wrote {model_path}")
+        if args.skip_check:
+            return
+    if not check(backend_name, model_path, args.images, args.min_agreement):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
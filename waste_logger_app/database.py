@@ -1,8 +1,9 @@
 # waste_logger_app/database.py
 
-from sqlalchemy import create_engine, Column, Integer, String, Float, Boolean, DateTime
+from sqlalchemy import create_engine, event, inspect, Column, Integer, String, Float, Boolean, DateTime, Date, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from datetime import datetime
 
 
@@ -10,8 +11,40 @@ from datetime import datetime
 import os
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'waste_log.db')}"  # Changed to absolute path
+# Point somewhere else (e.g. a benchmark database) without touching the real one
+DATABASE_URL = os.environ.get("WASTE_LOGGER_DATABASE_URL", DATABASE_URL)
+IS_SQLITE = DATABASE_URL.startswith("sqlite")
+
+# Pool sized for the request threadpool readers plus the db executor and the
+# single write-behind writer (see write_behind.py); override via the environment
+POOL_SIZE = int(os.environ.get("WASTE_LOGGER_DB_POOL_SIZE", "10"))
+POOL_OVERFLOW = int(os.environ.get("WASTE_LOGGER_DB_POOL_OVERFLOW", "20"))
+
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False} if IS_SQLITE else {},
+    poolclass=QueuePool,
+    pool_size=POOL_SIZE,
+    max_overflow=POOL_OVERFLOW,
+)
+
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",  # readers no longer block the writer
+    "PRAGMA synchronous=NORMAL",  # fsync at checkpoints, not every commit (safe with WAL)
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA mmap_size=268435456",
+)
+
+
+@event.listens_for(engine, "connect")
+def _configure_sqlite(dbapi_connection, connection_record):
+    if not IS_SQLITE:
+        return
+    cursor = dbapi_connection.cursor()
+    for pragma in SQLITE_PRAGMAS:
+        cursor.execute(pragma)
+    cursor.close()
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 Base = declarative_base()
 
@@ -28,6 +61,55 @@ class WasteLog(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
     username = Column(String, default="guest")  
     filename = Column(String)
+
+    __table_args__ = (
+        # Per-user, time-ordered reads (dashboard recent items, log pages)
+        Index("ix_waste_logs_username_timestamp", "username", "timestamp"),
+    )
+
+# Persistent tier of the classification cache (see classification_cache.py)
+class ClassificationCacheEntry(Base):
+    __tablename__ = "classification_cache"
+
+    content_hash = Column(String, primary_key=True)
+    model_version = Column(String, nullable=False, index=True)
+    label = Column(String)
+    confidence = Column(Float)
+    # Top-k class ids and probabilities as "id:prob" pairs; the carbon fields are
+    # recomputed from these on every hit (see model_loader.estimate)
+    top_classes = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Perceptual hash of each classified image, for near-duplicate lookups (see near_duplicates.py).
+# The prediction itself lives in classification_cache under the same content hash.
+class ImageHash(Base):
+    __tablename__ = "image_hashes"
+
+    content_hash = Column(String, primary_key=True)
+    dhash = Column(Integer, nullable=False)  # 64-bit dHash stored as a signed integer
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# Per-user running totals, updated in the same transaction as each WasteLog insert
+# (see aggregates.py); serves the public leaderboard without scanning waste_logs
+class UserStats(Base):
+    __tablename__ = "user_stats"
+
+    username = Column(String, primary_key=True)
+    entry_count = Column(Integer, nullable=False, default=0)
+    recyclable_count = Column(Integer, nullable=False, default=0)
+    total_co2 = Column(Float, nullable=False, default=0.0)
+    last_activity = Column(DateTime)
+
+# One row per user per day; the dashboard totals and CO2 trend read from here
+class DailyRollup(Base):
+    __tablename__ = "daily_rollups"
+
+    username = Column(String, primary_key=True)
+    day = Column(Date, primary_key=True)
+    co2_total = Column(Float, nullable=False, default=0.0)
+    entries = Column(Integer, nullable=False, default=0)
+    recyclable = Column(Integer, nullable=False, default=0)
+
 # Dependency for FastAPI routes
 def get_db():
     db = SessionLocal()
@@ -36,5 +118,16 @@ def get_db():
     finally:
         db.close()
 
+# classification_cache only holds derived data, so a table from before it kept
+# top_classes (and stored carbon fields instead) is dropped rather than migrated
+def _drop_outdated_cache():
+    inspector = inspect(engine)
+    if not inspector.has_table(ClassificationCacheEntry.__tablename__):
+        return
+    columns = {column["name"] for column in inspector.get_columns(ClassificationCacheEntry.__tablename__)}
+    if "top_classes" not in columns:
+        ClassificationCacheEntry.__table__.drop(bind=engine)
+
 # ✅ Automatically initialize the database when this module is loaded
+_drop_outdated_cache()
 Base.metadata.create_all(bind=engine)
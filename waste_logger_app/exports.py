@@ -0,0 +1,184 @@
+# waste_logger_app/exports.py
+#
+# Streaming exports of waste_logs as CSV, NDJSON or Parquet, for one user or
+# everyone, optionally limited to a date range. Rows are read in chunks of
+# `chunk_size` through a server-side cursor (yield_per) and each chunk is
+# encoded and handed on before the next one is fetched, so memory stays flat
+# however large the table is. Parquet needs the optional pyarrow package and
+# writes one row group per chunk.
+#
+#   python -m waste_logger_app.exports --format csv --user alice --from 2025-01-01 > alice.csv
+#   python -m waste_logger_app.exports --format parquet --output all_logs.parquet
+
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import date
+
+from sqlalchemy import select
+
+from waste_logger_app.database import SessionLocal, WasteLog
+from waste_logger_app.log_queries import LogFilters, NO_FILTERS, apply_filters
+
+DEFAULT_CHUNK_SIZE = 5000
+
+COLUMNS = ("id", "timestamp", "username", "label", "confidence", "material", "recyclable", "co2_estimate", "filename")
+
+FORMATS = {
+    # format -> (media type, file extension)
+    "csv": ("text/csv", ".csv"),
+    "ndjson": ("application/x-ndjson", ".ndjson"),
+    "parquet": ("application/vnd.apache.parquet", ".parquet"),
+}
+
+
+def iter_chunks(db, username=None, filters=NO_FILTERS, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Lists of row tuples in COLUMNS order; username None exports every user
+    statement = select(*(getattr(WasteLog, column) for column in COLUMNS))
+    statement = apply_filters(statement, username, filters)
+    if username is None:
+        statement = statement.order_by(WasteLog.id)
+    else:
+        statement = statement.order_by(WasteLog.timestamp, WasteLog.id)  # ix_waste_logs_username_timestamp
+    result = db.execute(statement.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        yield [tuple(row) for row in partition]
+
+
+def _plain(row):
+    values = list(row)
+    values[1] = values[1].isoformat() if values[1] else None
+    return values
+
+
+def csv_stream(chunks):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(COLUMNS)
+    for chunk in chunks:
+        writer.writerows(_plain(row) for row in chunk)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")  # header of an empty export
+
+
+def ndjson_stream(chunks):
+    for chunk in chunks:
+        yield "".join(json.dumps(dict(zip(COLUMNS, _plain(row)))) + "\n" for row in chunk).encode("utf-8")
+
+
+class _ByteSink:
+    # Write-only file object for ParquetWriter; drain() hands over what was written so far
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def writable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+def _parquet_schema(pa):
+    return pa.schema([
+        ("id", pa.int64()),
+        ("timestamp", pa.timestamp("us")),
+        ("username", pa.string()),
+        ("label", pa.string()),
+        ("confidence", pa.float64()),
+        ("material", pa.string()),
+        ("recyclable", pa.bool_()),
+        ("co2_estimate", pa.float64()),
+        ("filename", pa.string()),
+    ])
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def parquet_stream(chunks):
+    # One row group per chunk; the footer arrives with the last piece
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = _parquet_schema(pa)
+    sink = _ByteSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for chunk in chunks:
+            columns = list(zip(*chunk)) if chunk else [[] for _ in COLUMNS]
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema,
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+STREAMS = {"csv": csv_stream, "ndjson": ndjson_stream, "parquet": parquet_stream}
+
+
+def export(fmt, username=None, filters=NO_FILTERS, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Generator of encoded bytes; owns its database session for the whole stream
+    db = SessionLocal()
+    try:
+        yield from STREAMS[fmt](iter_chunks(db, username, filters, chunk_size))
+    finally:
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export waste logs")
+    parser.add_argument("--format", choices=sorted(FORMATS), default="csv")
+    parser.add_argument("--user", help="only this user's logs (default: everyone)")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat, help="YYYY-MM-DD, inclusive")
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat, help="YYYY-MM-DD, inclusive")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument("--output", default="-", help="file path, or - for stdout")
+    args = parser.parse_args()
+
+    if args.format == "parquet" and not parquet_available():
+        parser.error("Parquet export needs pyarrow (pip install pyarrow)")
+    if args.format == "parquet" and args.output == "-" and sys.stdout.isatty():
+        parser.error("refusing to write Parquet to a terminal; use --output")
+
+    filters = LogFilters(args.date_from, args.date_to, None, None)
+    out = sys.stdout.buffer if args.output == "-" else open(args.output, "wb")
+    try:
+        for piece in export(args.format, args.user, filters, args.chunk_size):
+            out.write(piece)
+    finally:
+        if out is not sys.stdout.buffer:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# waste_logger_app/image_store.py
+#
+# Content-addressed storage for uploaded images. Files are named by the
+# SHA-256 of their bytes and sharded as store/ab/cd/<hash><ext> under static/,
+# so identical uploads are stored once and names can never collide.
+# WasteLog.filename holds the path relative to static/.
+
+import hashlib
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from waste_logger_app.metrics import timer
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# Served at /static; overridable so benchmarks and tests keep their uploads apart
+STATIC_DIR = os.environ.get("WASTE_LOGGER_STATIC_DIR", os.path.join(BASE_DIR, "static"))
+STORE_PREFIX = "store"
+
+WRITER_THREADS = int(os.environ.get("WASTE_LOGGER_STORE_WRITERS", "2"))
+
+
+def relative_path(digest, extension):
+    return "/".join([STORE_PREFIX, digest[:2], digest[2:4], f"{digest}{extension}"])
+
+
+class ImageStore:
+    def __init__(self, static_dir=STATIC_DIR, writer_threads=WRITER_THREADS):
+        self.static_dir = static_dir
+        self._executor = ThreadPoolExecutor(max_workers=writer_threads, thread_name_prefix="store")
+        self._pending = {}
+        self._lock = threading.Lock()
+        # Callables (filename, data) run after a new image is written, e.g. thumbnails
+        self.derivatives = []
+
+    def absolute_path(self, filename):
+        return os.path.join(self.static_dir, *filename.split("/"))
+
+    def exists(self, filename):
+        return os.path.exists(self.absolute_path(filename))
+
+    def put(self, data, extension, digest=None):
+        # Synchronous write; returns the filename relative to static/
+        digest = digest or hashlib.sha256(data).hexdigest()
+        filename = relative_path(digest, extension)
+        self._write(filename, data)
+        return filename
+
+    def put_named(self, filename, data):
+        # Write under an explicit name relative to static/ (derived files); no derivatives
+        return self._write(filename, data, derive=False)
+
+    def put_async(self, data, extension, digest=None):
+        # Name is known immediately; the write happens on the store executor.
+        # Returns (filename, future) - wait on the future only when durability matters.
+        digest = digest or hashlib.sha256(data).hexdigest()
+        filename = relative_path(digest, extension)
+        with self._lock:
+            future = self._pending.get(filename)
+            created = future is None
+            if created:
+                future = self._executor.submit(self._write, filename, data)
+                self._pending[filename] = future
+        if created:
+            # Outside the lock: a write that already finished runs the callback inline
+            future.add_done_callback(lambda _f: self._forget(filename))
+        return filename, future
+
+    def pending_write(self, filename):
+        # Future of a put_async write still in progress for `filename`, or None
+        with self._lock:
+            return self._pending.get(filename)
+
+    def _forget(self, filename):
+        with self._lock:
+            self._pending.pop(filename, None)
+
+    def _write(self, filename, data, derive=True):
+        path = self.absolute_path(filename)
+        if os.path.exists(path):
+            return path  # deduplicated: same hash, same bytes
+
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        # Write to a temp file and rename so readers never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+        try:
+            with timer("image_write"), os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+        if derive:
+            for derivative in self.derivatives:
+                try:
+                    derivative(filename, data)
+                except Exception:
+                    pass  # derived files are regenerated on demand when missing
+        return path
+
+
+store = ImageStore()
@@ -0,0 +1,235 @@
+# waste_logger_app/inference_backends.py
+#
+# Interchangeable engines behind model_loader. Every backend takes a float32
+# batch already scaled by model_loader.preprocess_input, shape (n, 224, 224, 3),
+# and returns softmax probabilities of shape (n, 1000).
+#
+# Select one with WASTE_LOGGER_BACKEND=keras|tflite|onnx|remote. The TFLite and
+# ONNX model files are produced by convert_model.py; "remote" forwards batches
+# to a shared inference_server.py process.
+#
+# Local backends expose artifact_digest, a content hash of the weights they
+# loaded; model_loader.model_version_for builds the cache version from it.
+
+import hashlib
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, "models_bin")
+
+DEFAULT_TFLITE_PATH = os.path.join(MODELS_DIR, "mobilenet_v2_dynamic.tflite")
+DEFAULT_ONNX_PATH = os.path.join(MODELS_DIR, "mobilenet_v2.onnx")
+
+DIGEST_CHARS = 16
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()[:DIGEST_CHARS]
+
+
+def weights_digest(arrays):
+    # Hash of the weights in memory, for models without a single file of their own
+    digest = hashlib.sha256()
+    for array in arrays:
+        digest.update(np.ascontiguousarray(array).tobytes())
+    return digest.hexdigest()[:DIGEST_CHARS]
+
+
+class KerasBackend:
+    name = "keras"
+
+    def __init__(self, weights_path=None):
+        from tensorflow.keras.applications import MobileNetV2
+
+        self.model = MobileNetV2(weights=weights_path or "imagenet")
+        # The "imagenet" download has no path of ours, so hash what was actually loaded
+        self.artifact_digest = weights_digest(self.model.get_weights())
+
+    def predict(self, batch):
+        return self.model.predict(batch, batch_size=len(batch), verbose=0)
+
+
+class TFLiteBackend:
+    name = "tflite"
+
+    def __init__(self, model_path=None, num_threads=None):
+        model_path = model_path or os.environ.get("WASTE_LOGGER_TFLITE_PATH", DEFAULT_TFLITE_PATH)
+        try:
+            from tflite_runtime.interpreter import Interpreter  # small runtime-only wheel
+        except ImportError:
+            from tensorflow.lite import Interpreter
+
+        self.interpreter = Interpreter(model_path=model_path, num_threads=num_threads or os.cpu_count())
+        self.artifact_digest = file_digest(model_path)
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]
+        self._batch_size = None
+        # An interpreter is not safe to share between threads
+        self._lock = threading.Lock()
+
+    def _resize(self, batch_size):
+        if batch_size != self._batch_size:
+            self.interpreter.resize_tensor_input(self.input["index"], [batch_size, 224, 224, 3])
+            self.interpreter.allocate_tensors()
+            self.input = self.interpreter.get_input_details()[0]
+            self.output = self.interpreter.get_output_details()[0]
+            self._batch_size = batch_size
+
+    def predict(self, batch):
+        with self._lock:
+            self._resize(len(batch))
+            data = batch
+            scale, zero_point = self.input["quantization"]
+            if self.input["dtype"] != np.float32:
+                # Fully int8-quantized model: quantize the float input ourselves
+                info = np.iinfo(self.input["dtype"])
+                data = np.clip(np.round(batch / scale + zero_point), info.min, info.max)
+            self.interpreter.set_tensor(self.input["index"], data.astype(self.input["dtype"]))
+            self.interpreter.invoke()
+            probs = self.interpreter.get_tensor(self.output["index"])
+
+            scale, zero_point = self.output["quantization"]
+            if self.output["dtype"] != np.float32:
+                probs = (probs.astype(np.float32) - zero_point) * scale
+            return probs.copy()
+
+
+class OnnxBackend:
+    name = "onnx"
+
+    def __init__(self, model_path=None):
+        import onnxruntime
+
+        model_path = model_path or os.environ.get("WASTE_LOGGER_ONNX_PATH", DEFAULT_ONNX_PATH)
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.artifact_digest = file_digest(model_path)
+        self.input_name = self.session.get_inputs()[0].name
+
+    def predict(self, batch):
+        return self.session.run(None, {self.input_name: batch.astype(np.float32)})[0]
+
+
+class RemoteBackend:
+    # Client for inference_server.py. Sends the raw uint8 images (4x smaller
+    # than the scaled float32 batch) and reconnects when the server restarts.
+    # server_backend and model_version come from the server's handshake.
+    name = "remote"
+    input_dtype = "uint8"
+
+    def __init__(self, socket_path=None, connect_timeout=None, request_timeout=None):
+        from waste_logger_app import inference_server
+
+        self._protocol = inference_server
+        self.socket_path = socket_path or inference_server.DEFAULT_SOCKET_PATH
+        self.connect_timeout = float(
+            connect_timeout or os.environ.get("WASTE_LOGGER_INFERENCE_CONNECT_TIMEOUT", "60")
+        )
+        self.request_timeout = float(
+            request_timeout or os.environ.get("WASTE_LOGGER_INFERENCE_REQUEST_TIMEOUT", "30")
+        )
+        self._sock = None
+        self._ids = itertools.count(1)
+        self.server_backend = None
+        self.model_version = None
+        # One request in flight per connection
+        self._lock = threading.Lock()
+        with self._lock:
+            self._connect()
+
+    def _connect(self):
+        # Retry with backoff so workers can start before (or outlive) the server
+        deadline = time.monotonic() + self.connect_timeout
+        delay = 0.05
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.socket_path)
+            except OSError as exc:
+                sock.close()
+                if time.monotonic() + delay > deadline:
+                    raise ConnectionError(f"inference server not reachable at {self.socket_path}: {exc}")
+                time.sleep(delay)
+                delay = min(delay * 2, 1.0)
+                continue
+            sock.settimeout(self.request_timeout)
+            try:
+                self._handshake(sock)
+            except BaseException:
+                sock.close()
+                raise
+            self._sock = sock
+            return
+
+    def _handshake(self, sock):
+        protocol = self._protocol
+        (size,) = protocol.HANDSHAKE_HEADER.unpack(protocol.recv_exact(sock, protocol.HANDSHAKE_HEADER.size))
+        hello = json.loads(bytes(protocol.recv_exact(sock, size)).decode("utf-8"))
+        if self.model_version is not None and hello["model_version"] != self.model_version:
+            # Cached results are keyed by the version this worker started with
+            raise RuntimeError(
+                f"inference server now runs {hello['model_version']}, this worker was started "
+                f"against {self.model_version}; restart the web workers"
+            )
+        self.server_backend = hello["backend"]
+        self.model_version = hello["model_version"]
+
+    def _disconnect(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+    def _request(self, images):
+        protocol = self._protocol
+        request_id = next(self._ids)
+        self._sock.sendall(protocol.REQUEST_HEADER.pack(request_id, len(images)) + images.tobytes())
+        header = protocol.recv_exact(self._sock, protocol.RESPONSE_HEADER.size)
+        response_id, status, num_classes, size = protocol.RESPONSE_HEADER.unpack(header)
+        payload = protocol.recv_exact(self._sock, size)
+        if response_id != request_id:
+            raise ConnectionError(f"inference response {response_id} does not match request {request_id}")
+        if status != protocol.STATUS_OK:
+            raise RuntimeError(f"inference server error: {payload.decode('utf-8', 'replace')}")
+        return np.frombuffer(payload, dtype=np.float32).reshape(len(images), num_classes)
+
+    def predict(self, batch):
+        images = np.ascontiguousarray(batch, dtype=np.uint8)
+        with self._lock:
+            # Inference is idempotent, so a request cut off by a server restart is resent once
+            for attempt in (1, 2):
+                if self._sock is None:
+                    self._connect()
+                try:
+                    return self._request(images)
+                except (OSError, ConnectionError):
+                    self._disconnect()
+                    if attempt == 2:
+                        raise
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+    "remote": RemoteBackend,
+}
+
+
+def create_backend(name, **kwargs):
+    try:
+        backend_class = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend {name!r}; choose from {', '.join(BACKENDS)}")
+    return backend_class(**kwargs)
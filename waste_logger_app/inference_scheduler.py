@@ -0,0 +1,104 @@
+# waste_logger_app/inference_scheduler.py
+#
+# Gathers concurrent classification requests into one batched predict call.
+# Callers get a concurrent.futures.Future back; a single worker thread drains
+# the queue, waiting at most `max_wait_ms` for a batch of `max_batch_size`.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class InferenceScheduler:
+    def __init__(self, predict_batch, max_batch_size=16, max_wait_ms=10):
+        # predict_batch(items) must return one result per item, in order
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+
+        # Counters exposed through stats()
+        self._batches = 0
+        self._items = 0
+        self._last_batch_size = 0
+        self._max_seen_batch_size = 0
+        self._batch_size_counts = {}
+
+    def submit(self, item):
+        future = Future()
+        self._ensure_worker()
+        self._queue.put((item, future))
+        return future
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "batches": self._batches,
+                "items": self._items,
+                "last_batch_size": self._last_batch_size,
+                "max_batch_size_seen": self._max_seen_batch_size,
+                "mean_batch_size": (self._items / self._batches) if self._batches else 0.0,
+                "batch_size_counts": dict(self._batch_size_counts),
+            }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name="inference-scheduler", daemon=True
+                )
+                self._worker.start()
+
+    def _collect_batch(self):
+        # Block for the first item, then top the batch up until it is full
+        # or the wait budget measured from the first item runs out.
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect_batch()
+            # Drop requests whose callers have already given up
+            batch = [(item, fut) for item, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            self._record_batch(len(batch))
+            try:
+                results = self.predict_batch([item for item, _ in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(
+                        f"predict_batch returned {len(results)} results for {len(batch)} items"
+                    )
+            except BaseException as exc:
+                for _, fut in batch:
+                    fut.set_exception(exc)
+                continue
+
+            for (_, fut), result in zip(batch, results):
+                fut.set_result(result)
+
+    def _record_batch(self, size):
+        with self._lock:
+            self._batches += 1
+            self._items += size
+            self._last_batch_size = size
+            self._max_seen_batch_size = max(self._max_seen_batch_size, size)
+            self._batch_size_counts[size] = self._batch_size_counts.get(size, 0) + 1
@@ -0,0 +1,167 @@
+# waste_logger_app/inference_server.py
+#
+# Optional shared inference process for multi-worker deployments. It owns the
+# one copy of the model; every uvicorn worker runs with
+# WASTE_LOGGER_BACKEND=remote and sends its uint8 image batches here over a
+# Unix domain socket. Requests from all workers go through a single
+# InferenceScheduler, so they are batched together.
+#
+#   python -m waste_logger_app.inference_server --backend tflite
+#   WASTE_LOGGER_BACKEND=remote uvicorn waste_logger_app.main:app --workers 8
+#
+# Wire format (network byte order), one request in flight per connection:
+#   handshake: sent by the server on connect, length u32 then UTF-8 JSON
+#              {"backend": ..., "model_version": ...}; workers key their result
+#              caches by this model_version
+#   request:  request_id u64, count u32, then count * 224*224*3 uint8 pixels
+#   response: request_id u64, status u8, num_classes u32, payload_len u32, then
+#             count * num_classes float32 probabilities (status 0) or a UTF-8
+#             error message (status 1)
+
+import argparse
+import json
+import os
+import socket
+import socketserver
+import struct
+
+import numpy as np
+
+from waste_logger_app import inference_backends
+from waste_logger_app.inference_scheduler import InferenceScheduler
+
+DEFAULT_SOCKET_PATH = os.environ.get("WASTE_LOGGER_INFERENCE_SOCKET", "/tmp/waste-logger-inference.sock")
+
+IMAGE_SHAPE = (224, 224, 3)
+IMAGE_BYTES = IMAGE_SHAPE[0] * IMAGE_SHAPE[1] * IMAGE_SHAPE[2]
+MAX_REQUEST_IMAGES = 256
+
+HANDSHAKE_HEADER = struct.Struct("!I")
+REQUEST_HEADER = struct.Struct("!QI")
+RESPONSE_HEADER = struct.Struct("!QBII")
+STATUS_OK = 0
+STATUS_ERROR = 1
+
+
+def recv_exact(sock, size):
+    buffer = bytearray(size)
+    view = memoryview(buffer)
+    received = 0
+    while received < size:
+        chunk = sock.recv_into(view[received:], size - received)
+        if not chunk:
+            raise ConnectionError("inference connection closed")
+        received += chunk
+    return buffer
+
+
+class InferenceEngine:
+    # Wraps a local backend with the cross-worker scheduler
+    def __init__(self, backend, max_batch_size=32, max_wait_ms=5, warmup=True):
+        from waste_logger_app import model_loader  # for preprocessing, warmup sizes and the version only
+
+        self.backend = backend
+        self.model_version = model_loader.model_version_for(backend)
+        self._preprocess = model_loader.preprocess_input
+        self.scheduler = InferenceScheduler(self._predict, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+        if warmup:
+            for size in model_loader.warmup_batch_sizes(max_batch_size):
+                backend.predict(np.zeros((size,) + IMAGE_SHAPE, dtype="float32"))
+
+    def _predict(self, arrays):
+        probs = self.backend.predict(self._preprocess(np.stack(arrays)))
+        return list(np.asarray(probs, dtype=np.float32))
+
+    def predict(self, images):
+        futures = [self.scheduler.submit(image) for image in images]
+        return np.stack([future.result() for future in futures])
+
+    def handshake(self):
+        payload = json.dumps({"backend": self.backend.name, "model_version": self.model_version}).encode("utf-8")
+        return HANDSHAKE_HEADER.pack(len(payload)) + payload
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        engine = self.server.engine
+        sock = self.request
+        sock.sendall(engine.handshake())
+        while True:
+            try:
+                request_id, count = REQUEST_HEADER.unpack(recv_exact(sock, REQUEST_HEADER.size))
+            except ConnectionError:
+                return  # client went away between requests
+
+            if count > MAX_REQUEST_IMAGES:
+                self._send_error(request_id, f"batch of {count} images exceeds {MAX_REQUEST_IMAGES}")
+                return
+            pixels = recv_exact(sock, count * IMAGE_BYTES)
+            images = np.frombuffer(pixels, dtype=np.uint8).reshape((count,) + IMAGE_SHAPE)
+
+            try:
+                probs = engine.predict(list(images)) if count else np.zeros((0, 0), dtype=np.float32)
+            except Exception as exc:
+                self._send_error(request_id, repr(exc))
+                continue
+
+            payload = np.ascontiguousarray(probs, dtype=np.float32).tobytes()
+            num_classes = probs.shape[1] if probs.ndim == 2 else 0
+            sock.sendall(RESPONSE_HEADER.pack(request_id, STATUS_OK, num_classes, len(payload)) + payload)
+
+    def _send_error(self, request_id, message):
+        payload = message.encode("utf-8")
+        self.request.sendall(RESPONSE_HEADER.pack(request_id, STATUS_ERROR, 0, len(payload)) + payload)
+
+
+class InferenceServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, engine):
+        if os.path.exists(socket_path):
+            # Refuse to steal the socket from a live server; clear a stale one
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(socket_path)
+            except OSError:
+                os.unlink(socket_path)
+            else:
+                raise SystemExit(f"An inference server is already listening on {socket_path}")
+            finally:
+                probe.close()
+        self.engine = engine
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o660)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared inference server for waste logger web workers")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET_PATH)
+    parser.add_argument(
+        "--backend",
+        default=os.environ.get("WASTE_LOGGER_SERVER_BACKEND", "keras"),
+        choices=[name for name in inference_backends.BACKENDS if name != "remote"],
+    )
+    parser.add_argument("--model", help="model file for the tflite/onnx backends")
+    parser.add_argument("--max-batch-size", type=int, default=int(os.environ.get("WASTE_LOGGER_SERVER_MAX_BATCH_SIZE", "32")))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.environ.get("WASTE_LOGGER_SERVER_MAX_BATCH_WAIT_MS", "5")))
+    args = parser.parse_args()
+
+    if args.backend == "keras":
+        backend = inference_backends.create_backend("keras", weights_path=os.environ.get("WASTE_LOGGER_WEIGHTS_PATH"))
+    else:
+        backend = inference_backends.create_backend(args.backend, model_path=args.model)
+    engine = InferenceEngine(backend, max_batch_size=args.max_batch_size, max_wait_ms=args.max_wait_ms)
+
+    server = InferenceServer(args.socket, engine)
+    print(f"Serving {args.backend} inference on {args.socket}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+
+
+if __name__ == "__main__":
+    main()
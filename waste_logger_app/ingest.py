@@ -0,0 +1,236 @@
+# waste_logger_app/ingest.py
+#
+# Offline bulk ingest into waste_logs.
+#
+#   python -m waste_logger_app.ingest images /path/to/archive --username bin-cam-3
+#   python -m waste_logger_app.ingest legacy-csv waste_logger_app/waste_log.csv
+#
+# Images are decoded and preprocessed in a process pool, classified in large
+# batches with the model_loader model and committed one batch per transaction.
+# Finished files are appended to a checkpoint file so an interrupted run can
+# simply be started again.
+
+import argparse
+import itertools
+import os
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+from PIL import Image
+
+from waste_logger_app import preprocessing
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff")
+
+# One decoded file from the pool: prepared and mtime are set, or error is
+Loaded = namedtuple("Loaded", ["path", "prepared", "mtime", "error"])
+
+
+class Checkpoint:
+    # Append-only set of finished keys, one per line
+    def __init__(self, path):
+        self.path = path
+        self.done = set()
+        if path and os.path.exists(path):
+            with open(path) as f:
+                self.done = {line.rstrip("\n") for line in f if line.strip()}
+
+    def __contains__(self, key):
+        return key in self.done
+
+    def add_all(self, keys):
+        if not self.path:
+            return
+        with open(self.path, "a") as f:
+            for key in keys:
+                f.write(key + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.done.update(keys)
+
+
+def _walk_images(root):
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames.sort()
+        for name in sorted(filenames):
+            if name.lower().endswith(IMAGE_SUFFIXES):
+                yield os.path.join(dirpath, name)
+
+
+def _load(path):
+    # Runs in a worker process: read, decode once, build the model input
+    try:
+        with open(path, "rb") as f:
+            contents = f.read()
+        prepared = preprocessing.prepare_image(contents)
+    except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as exc:
+        # Unreadable, truncated or hostile files (PIL raises all of these) are skipped, not fatal
+        return Loaded(path, None, None, str(exc) or type(exc).__name__)
+    return Loaded(path, prepared, os.path.getmtime(path), None)
+
+
+def _load_chunk(paths):
+    return [_load(path) for path in paths]
+
+
+def _batches(iterable, size):
+    batch = []
+    for item in iterable:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _load_bounded(pool, paths, chunk_size, max_in_flight):
+    # pool.map without submitting everything up front: at most `max_in_flight`
+    # chunks are queued or decoded at a time, refilled as results are consumed,
+    # so prepared images never pile up faster than the model takes them
+    chunks = _batches(paths, chunk_size)
+    in_flight = deque(pool.submit(_load_chunk, chunk) for chunk in itertools.islice(chunks, max_in_flight))
+    while in_flight:
+        results = in_flight.popleft().result()
+        for chunk in itertools.islice(chunks, 1):
+            in_flight.append(pool.submit(_load_chunk, chunk))
+        yield from results
+
+
+def _ensure_aggregates():
+    # Backfill user_stats/daily_rollups first so the increments below land on complete totals
+    from waste_logger_app import aggregates
+    from waste_logger_app.database import SessionLocal
+
+    with SessionLocal() as db:
+        aggregates.ensure_aggregates(db)
+
+
+def ingest_images(root, username, batch_size=64, workers=None, checkpoint_path=None, use_file_times=True):
+    # Imported here so pool workers (which only need preprocessing) never load the model
+    from waste_logger_app import model_loader, pipeline
+    from waste_logger_app.image_store import store
+
+    _ensure_aggregates()
+    checkpoint = Checkpoint(checkpoint_path)
+    root = os.path.abspath(root)
+    paths = [p for p in _walk_images(root) if os.path.relpath(p, root) not in checkpoint]
+    print(f"{len(paths)} images to ingest ({len(checkpoint.done)} already done).")
+
+    started = time.monotonic()
+    ingested = failed = 0
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        loaded = _load_bounded(pool, paths, max(1, batch_size // 4), workers * 2)
+        for batch in _batches(loaded, batch_size):
+            good = []
+            for item in batch:
+                if item.error is not None:
+                    failed += 1
+                    print(f"skipped {item.path}: {item.error}")
+                else:
+                    good.append(item)
+
+            outputs = model_loader.predict_batch([item.prepared.array for item in good]) if good else []
+            predictions = [model_loader.estimate(output) for output in outputs]
+            rows = []
+            for item, (label, confidence, material, recyclable, co2) in zip(good, predictions):
+                rows.append(dict(
+                    label=label,
+                    confidence=confidence,
+                    material=material,
+                    recyclable=recyclable,
+                    co2_estimate=co2,
+                    username=username,
+                    filename=store.put(item.prepared.artifact, item.prepared.extension),
+                    timestamp=datetime.utcfromtimestamp(item.mtime) if use_file_times else datetime.utcnow(),
+                ))
+            if rows:
+                pipeline.insert_logs(rows)
+            checkpoint.add_all([os.path.relpath(item.path, root) for item in batch])
+
+            ingested += len(rows)
+            elapsed = time.monotonic() - started
+            print(f"{ingested} ingested, {failed} skipped, {ingested / elapsed:.1f} images/s")
+
+    return ingested
+
+
+def import_legacy_csv(path, username="guest", checkpoint_path=None):
+    # Rows written by waste_logger.log_item never reached the database
+    from waste_logger_app import pipeline, waste_logger
+    from waste_logger_app.image_store import STATIC_DIR, store
+
+    _ensure_aggregates()
+    checkpoint = Checkpoint(checkpoint_path)
+    source = os.path.abspath(path)
+
+    rows, keys = [], []
+    for number, row in enumerate(waste_logger.read_log(path)):
+        key = f"{source}#{number}"
+        if key in checkpoint:
+            continue
+
+        # Point at the image store when the original file is still around
+        filename = row.get("filename")
+        image_path = os.path.join(STATIC_DIR, filename) if filename else None
+        if image_path and os.path.isfile(image_path):
+            with open(image_path, "rb") as f:
+                contents = f.read()
+            filename = store.put(*preprocessing.prepare_artifact(contents))
+
+        rows.append(dict(
+            label=row["label"],
+            confidence=None,
+            material=row["material"],
+            recyclable=str(row["recyclable"]).strip().lower() == "true",
+            co2_estimate=float(row["co2_kg"]) if row.get("co2_kg") else None,
+            username=username,
+            filename=filename,
+        ))
+        keys.append(key)
+
+    if rows:
+        pipeline.insert_logs(rows)
+    checkpoint.add_all(keys)
+    print(f"Imported {len(rows)} legacy rows from {path}.")
+    return len(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bulk ingest into the waste log database")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    images = sub.add_parser("images", help="classify and log every image under a directory")
+    images.add_argument("root")
+    images.add_argument("--username", default="guest")
+    images.add_argument("--batch-size", type=int, default=64)
+    images.add_argument("--workers", type=int, default=None, help="preprocessing processes (default: CPU count)")
+    images.add_argument("--checkpoint", default=".ingest-checkpoint", help="resume file ('' to disable)")
+    images.add_argument("--now", action="store_true", help="timestamp rows now instead of file mtime")
+
+    legacy = sub.add_parser("legacy-csv", help="import rows from the old waste_log.csv")
+    legacy.add_argument("path", nargs="?", default=os.path.join(os.path.dirname(__file__), "waste_log.csv"))
+    legacy.add_argument("--username", default="guest")
+    legacy.add_argument("--checkpoint", default=".ingest-legacy-checkpoint", help="resume file ('' to disable)")
+
+    args = parser.parse_args()
+    if args.command == "images":
+        ingest_images(
+            args.root,
+            args.username,
+            batch_size=args.batch_size,
+            workers=args.workers,
+            checkpoint_path=args.checkpoint or None,
+            use_file_times=not args.now,
+        )
+    else:
+        import_legacy_csv(args.path, username=args.username, checkpoint_path=args.checkpoint or None)
+
+
+if __name__ == "__main__":
+    # Run through the package module so pool workers can unpickle _load
+    from waste_logger_app.ingest import main as _main
+    _main()
@@ -0,0 +1,189 @@
+# waste_logger_app/live_updates.py
+#
+# Server-Sent Events for the leaderboard (/public) and each user's dashboard
+# (/). The log writer thread calls publish() after every commit; the event loop
+# collects the changes for `DEBOUNCE_MS`, runs one aggregation for the whole
+# group and encodes each event once, then hands the same bytes to every
+# subscriber. A thousand leaderboard viewers therefore cost one leaderboard
+# query per burst of commits, not one per viewer reload.
+#
+# Events:
+#   leaderboard  {"full": bool, "rows": [{rank, username, total_co2, recyclable_percent, total_entries}]}
+#                rows whose rank or totals changed; "full" replaces the table
+#   dashboard    {total_co2, percent_recyclable, total_entries, co2_trend: {day: co2}, recent: [...]}
+#                sent only to the user whose logs were committed
+#   resync       the subscriber fell behind; the page reloads
+#
+# Each worker process broadcasts the commits made by its own log writer.
+
+import asyncio
+import json
+import os
+from collections import defaultdict
+
+from waste_logger_app import aggregates, concurrency
+from waste_logger_app.database import SessionLocal
+
+DEBOUNCE_MS = float(os.environ.get("WASTE_LOGGER_LIVE_DEBOUNCE_MS", "250"))
+KEEPALIVE_SECONDS = 15.0
+# Streams end after this long and the browser reconnects (EventSource retry),
+# so open streams never hold up a graceful shutdown for long
+MAX_STREAM_SECONDS = float(os.environ.get("WASTE_LOGGER_LIVE_MAX_STREAM_SECONDS", "60"))
+RETRY_MS = 3000
+SUBSCRIBER_BUFFER = 32
+RECENT_LIMIT = 3
+
+
+def encode(event, data):
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+        self.lagged = False
+
+    def offer(self, message):
+        # Never block the broadcaster on a slow client; it resyncs instead
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.lagged = True
+
+
+def _aggregate(with_leaderboard, user_days):
+    # Runs on the db executor: one leaderboard query plus one lookup per changed user
+    db = SessionLocal()
+    try:
+        board = aggregates.leaderboard(db) if with_leaderboard else None
+        dashboards = {username: aggregates.user_totals(db, username, days) for username, days in user_days.items()}
+        return board, dashboards
+    finally:
+        db.close()
+
+
+class Broadcaster:
+    def __init__(self, debounce_ms=DEBOUNCE_MS):
+        self.debounce = max(0.0, debounce_ms) / 1000.0
+        self._loop = None
+        self._leaderboard_subscribers = set()
+        self._user_subscribers = defaultdict(set)
+        self._pending = {}  # username -> {"days": set, "recent": list}
+        self._flush_task = None
+        self._flush_lock = None
+        self._ranks = None  # username -> last published leaderboard row
+        self._board_event = None  # last full leaderboard, for new subscribers
+
+        self.flushes = 0
+
+    def attach(self, loop):
+        # Called from the app's startup hook; publish() is a no-op until then
+        self._loop = loop
+        self._flush_lock = asyncio.Lock()
+
+    def detach(self):
+        self._loop = None
+
+    @property
+    def subscriber_count(self):
+        return len(self._leaderboard_subscribers) + sum(len(subs) for subs in self._user_subscribers.values())
+
+    def publish(self, changes):
+        # Any thread. changes: list of {"username", "day", "recent"} for committed rows
+        loop = self._loop
+        if loop is None or not changes or not self.subscriber_count:
+            return
+        try:
+            loop.call_soon_threadsafe(self._collect, changes)
+        except RuntimeError:
+            pass  # loop already closed during shutdown
+
+    async def stream(self, username=None):
+        # Async generator of SSE text; username None is the public leaderboard
+        subscriber = Subscriber()
+        if username is None:
+            self._leaderboard_subscribers.add(subscriber)
+            if self._board_event is not None:
+                subscriber.offer(self._board_event)
+        else:
+            self._user_subscribers[username].add(subscriber)
+        try:
+            yield f"retry: {RETRY_MS}\n\n"
+            # Not self._loop: detach() clears it at shutdown while streams are still open
+            loop = asyncio.get_running_loop()
+            deadline = loop.time() + MAX_STREAM_SECONDS
+            while not subscriber.lagged:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    return
+                try:
+                    yield await asyncio.wait_for(subscriber.queue.get(), min(KEEPALIVE_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+            yield encode("resync", {})
+        finally:
+            if username is None:
+                self._leaderboard_subscribers.discard(subscriber)
+                if not self._leaderboard_subscribers:
+                    # Nobody is watching: the next snapshot must be a full one
+                    self._ranks = self._board_event = None
+            else:
+                subscribers = self._user_subscribers.get(username)
+                if subscribers is not None:
+                    subscribers.discard(subscriber)
+                    if not subscribers:
+                        del self._user_subscribers[username]
+
+    def _collect(self, changes):
+        # Event loop: merge into the pending group and make sure a flush is scheduled
+        for change in changes:
+            pending = self._pending.setdefault(change["username"], {"days": set(), "recent": []})
+            pending["days"].add(change["day"])
+            pending["recent"].append(change["recent"])
+        if self._flush_task is None:
+            self._flush_task = self._loop.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.debounce)
+        pending, self._pending = self._pending, {}
+        self._flush_task = None  # commits from here on start the next group
+        async with self._flush_lock:  # keep leaderboard deltas in order
+            try:
+                await self._flush(pending)
+            except Exception:
+                # Viewers simply miss this update; the next commit publishes fresh totals
+                pass
+
+    async def _flush(self, pending):
+        with_leaderboard = bool(self._leaderboard_subscribers)
+        user_days = {username: p["days"] for username, p in pending.items() if username in self._user_subscribers}
+        if not with_leaderboard and not user_days:
+            return
+        board, dashboards = await concurrency.run_db(_aggregate, with_leaderboard, user_days)
+        self.flushes += 1
+
+        if board is not None:
+            self._publish_leaderboard(board)
+        for username, totals in dashboards.items():
+            totals["recent"] = pending[username]["recent"][-RECENT_LIMIT:]
+            message = encode("dashboard", totals)
+            for subscriber in list(self._user_subscribers.get(username, ())):
+                subscriber.offer(message)
+
+    def _publish_leaderboard(self, board):
+        ranked = [dict(row, rank=rank) for rank, row in enumerate(board, start=1)]
+        previous = self._ranks
+        if previous is None:
+            changed = ranked
+        else:
+            changed = [row for row in ranked if previous.get(row["username"]) != row]
+        self._ranks = {row["username"]: row for row in ranked}
+        self._board_event = encode("leaderboard", {"full": True, "rows": ranked})
+        if not changed:
+            return
+        message = self._board_event if previous is None else encode("leaderboard", {"full": False, "rows": changed})
+        for subscriber in list(self._leaderboard_subscribers):
+            subscriber.offer(message)
+
+
+broadcaster = Broadcaster()
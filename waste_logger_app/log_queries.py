@@ -0,0 +1,91 @@
+# waste_logger_app/log_queries.py
+#
+# Keyset-paginated reads of a user's waste log. Pages are ordered newest
+# first on (timestamp, id) and the cursor encodes the last row returned, so
+# every page is one indexed range scan regardless of history length.
+
+import base64
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from sqlalchemy import and_, case, func, or_
+
+from waste_logger_app.database import UserStats, WasteLog
+
+DEFAULT_PAGE_SIZE = 25
+MAX_PAGE_SIZE = 200
+
+LogFilters = namedtuple("LogFilters", ["date_from", "date_to", "material", "recyclable"])
+NO_FILTERS = LogFilters(None, None, None, None)
+
+
+def encode_cursor(entry):
+    raw = f"{entry.timestamp.isoformat()}|{entry.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor):
+    # Raises ValueError on anything that is not a cursor we issued
+    padded = cursor + "=" * (-len(cursor) % 4)
+    try:
+        timestamp, entry_id = base64.urlsafe_b64decode(padded.encode()).decode().split("|")
+        return datetime.fromisoformat(timestamp), int(entry_id)
+    except ValueError as exc:  # bad base64, bad UTF-8, wrong shape, bad timestamp/id
+        raise ValueError("invalid cursor") from exc
+
+
+def apply_filters(query, username, filters):
+    # Works on ORM queries and select() statements; username None means every user
+    if username is not None:
+        query = query.filter(WasteLog.username == username)
+    if filters.date_from:
+        query = query.filter(WasteLog.timestamp >= datetime.combine(filters.date_from, time.min))
+    if filters.date_to:
+        # date_to is inclusive
+        query = query.filter(WasteLog.timestamp < datetime.combine(filters.date_to + timedelta(days=1), time.min))
+    if filters.material:
+        query = query.filter(WasteLog.material == filters.material)
+    if filters.recyclable is not None:
+        query = query.filter(WasteLog.recyclable == filters.recyclable)
+    return query
+
+
+def fetch_page(db, username, filters=NO_FILTERS, cursor=None, limit=DEFAULT_PAGE_SIZE):
+    # -> (rows, next_cursor); next_cursor is None on the last page
+    limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+    query = apply_filters(db.query(WasteLog), username, filters)
+    if cursor:
+        timestamp, entry_id = decode_cursor(cursor)
+        query = query.filter(or_(
+            WasteLog.timestamp < timestamp,
+            and_(WasteLog.timestamp == timestamp, WasteLog.id < entry_id),
+        ))
+
+    rows = query.order_by(WasteLog.timestamp.desc(), WasteLog.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def totals(db, username, filters=NO_FILTERS):
+    if filters == NO_FILTERS:
+        # Unfiltered totals are already maintained in user_stats
+        stats = db.get(UserStats, username) if username else None
+        entries = stats.entry_count if stats else 0
+        co2 = stats.total_co2 if stats else 0.0
+        recyclable = stats.recyclable_count if stats else 0
+    else:
+        entries, co2, recyclable = apply_filters(
+            db.query(
+                func.count(WasteLog.id),
+                func.coalesce(func.sum(WasteLog.co2_estimate), 0.0),
+                func.coalesce(func.sum(case((WasteLog.recyclable, 1), else_=0)), 0),
+            ),
+            username,
+            filters,
+        ).one()
+
+    return {
+        "total_entries": entries,
+        "total_co2": round(co2, 2),
+        "percent_recyclable": round((recyclable / entries * 100) if entries else 0, 2),
+    }
@@ -1,40 +1,120 @@
 import os
 import io
 import uuid
-from fastapi import FastAPI, Request, Form, UploadFile, File, Depends,HTTPException
-from fastapi.responses import RedirectResponse
-from fastapi.staticfiles import StaticFiles
+import asyncio
+from fastapi import FastAPI, Request, Form, UploadFile, File, Depends,HTTPException, Query
+from fastapi.responses import RedirectResponse, HTMLResponse, JSONResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
 from starlette.middleware.sessions import SessionMiddleware
 from passlib.hash import bcrypt
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from PIL import Image
-from datetime import datetime
-from waste_logger_app.utils.dependencies import require_login
-from waste_logger_app import model_loader, carbon_utils
+from datetime import datetime, date
+from typing import Optional
+from urllib.parse import urlencode
+from waste_logger_app.utils.dependencies import require_login, require_model_ready
+from waste_logger_app import model_loader, concurrency, aggregates, log_queries, pipeline, user_profiles, metrics, image_store, thumbnails, uploads, preprocessing, live_updates
 from waste_logger_app.database import get_db, WasteLog, Base, engine, SessionLocal
-from waste_logger_app.routes import auth
+from waste_logger_app.routes import auth, batch, exports, live
 from waste_logger_app.models import user  
 from fastapi.exception_handlers import http_exception_handler
+from waste_logger_app.utils.ttl_cache import TTLCache
+from waste_logger_app.static_files import UploadStaticFiles
 Base.metadata.create_all(bind=engine)
 
 app = FastAPI()
 app.add_middleware(SessionMiddleware, secret_key="super-secret-key")
+# Oversized uploads are refused before the multipart body is parsed
+app.add_middleware(uploads.RequestSizeLimit, limits={
+    "/classify": uploads.MAX_UPLOAD_BYTES + uploads.FORM_OVERHEAD_BYTES,
+    "/classify/batch": batch.MAX_BATCH_REQUEST_BYTES,
+})
+app.middleware("http")(metrics.middleware)
 app.include_router(auth.router)
+app.include_router(batch.router)
+app.include_router(exports.router)
+app.include_router(live.router)
 
 
 # BASE_DIR = os.path.dirname(__file__)
 # UPLOAD_DIR = os.path.join(BASE_DIR, "static")
 # os.makedirs(UPLOAD_DIR, exist_ok=True)
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-STATIC_DIR = os.path.join(BASE_DIR, "static")
+STATIC_DIR = image_store.STATIC_DIR
 os.makedirs(STATIC_DIR, exist_ok=True)
 
 templates = Jinja2Templates(directory=os.path.join(BASE_DIR, "templates"))
-app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
+templates.env.globals["thumb_url"] = thumbnails.url
+# Uploads: immutable caching for content-addressed files, thumbnails on demand
+app.mount("/static", UploadStaticFiles(directory=STATIC_DIR), name="static")
 
-carbon_df = carbon_utils.load_carbon_table()
+result_cache = pipeline.result_cache
+# Once the model is loaded: the version includes a hash of its weights
+model_loader.on_model_version(pipeline.use_model_version)
+
+aggregates.check_dialect()
+aggregates.ensure_indexes()
+with SessionLocal() as _db:
+    aggregates.ensure_aggregates(_db)
+
+# Rendered /public page, shared by every viewer for a few seconds
+LEADERBOARD_TTL_SECONDS = float(os.environ.get("WASTE_LOGGER_LEADERBOARD_TTL", "5"))
+leaderboard_cache = TTLCache(ttl=LEADERBOARD_TTL_SECONDS, max_entries=1)
+
+
+metrics.gauge("waste_logger_inference_queue_depth", "Images waiting for a predict batch",
+              lambda: model_loader.scheduler.stats()["queue_depth"])
+metrics.gauge("waste_logger_log_writer_queue_depth", "Log submissions waiting for a group commit",
+              lambda: pipeline.log_writer.stats()["queue_depth"])
+metrics.gauge("waste_logger_classify_inflight", "Admitted /classify requests in progress",
+              lambda: concurrency.classify_admission.inflight)
+metrics.gauge("waste_logger_live_subscribers", "Open Server-Sent Events streams",
+              lambda: live_updates.broadcaster.subscriber_count)
+metrics.gauge("waste_logger_model_ready", "1 once the model is loaded and warmed up",
+              lambda: int(model_loader.is_ready()))
+
+
+@app.on_event("startup")
+def load_model_in_background():
+    # Build and warm the model off the request path; routes that do not
+    # classify are available immediately
+    if os.environ.get("WASTE_LOGGER_PRELOAD_MODEL", "1") != "0":
+        model_loader.start_background_load()
+
+
+@app.on_event("startup")
+async def start_live_updates():
+    # The log writer thread publishes commits onto this loop
+    live_updates.broadcaster.attach(asyncio.get_running_loop())
+
+
+@app.on_event("shutdown")
+def stop_live_updates():
+    live_updates.broadcaster.detach()
+
+
+@app.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@app.get("/readyz")
+def readyz():
+    # Probes count as demand for the model, like require_model_ready
+    model_loader.start_background_load()
+    status = model_loader.status()
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+
+@app.on_event("shutdown")
+def flush_log_writer():
+    pipeline.log_writer.close(timeout=10)
+
+
+@app.on_event("shutdown")
+def stop_auth_workers():
+    concurrency.auth_executor.shutdown(cancel_futures=True)
 
 
 @app.exception_handler(HTTPException)
@@ -47,32 +127,23 @@ async def custom_http_exception_handler(request: Request, exc: HTTPException):
 def index(request: Request, user_id: int = Depends(require_login), db: Session = Depends(get_db)):
     username = None
     if user_id:
-        db_user = db.query(user.User).filter(user.User.id == user_id).first()
-        if db_user:
-            username = db_user.username
-
-    # Get dashboard data
-    logs = db.query(WasteLog).filter(WasteLog.username == username).order_by(WasteLog.timestamp).all()
-    total_co2 = sum(entry.co2_estimate for entry in logs if entry.co2_estimate)
-    total_entries = len(logs)
-    recyclable_count = sum(1 for entry in logs if entry.recyclable)
-    percent_recyclable = (recyclable_count / total_entries * 100) if total_entries else 0
-
-    # Chart data
-    co2_trend = {}
-    for log in logs:
-        date_key = log.timestamp.strftime("%Y-%m-%d")
-        co2_trend[date_key] = co2_trend.get(date_key, 0) + log.co2_estimate
+        profile = user_profiles.get_profile(db, user_id)
+        if profile:
+            username = profile["username"]
+
+    # Dashboard data from the aggregate tables
+    with metrics.timer("dashboard_query"):
+        dashboard = aggregates.user_dashboard(db, username)
 
     return templates.TemplateResponse("index.html", {
         "request": request,
         "username": username,
         "message": None,
         "error": None,
-        "total_co2": round(total_co2, 2),
-        "percent_recyclable": round(percent_recyclable, 2),
-        "recent_logs": logs[-5:],
-        "co2_trend": co2_trend,
+        "total_co2": round(dashboard["total_co2"], 2),
+        "percent_recyclable": round(dashboard["percent_recyclable"], 2),
+        "recent_logs": dashboard["recent_logs"],
+        "co2_trend": dashboard["co2_trend"],
     })
 
 # @app.get("/")
@@ -95,42 +166,50 @@ def index(request: Request, user_id: int = Depends(require_login), db: Session =
 
 
 @app.post("/classify")
-async def classify_image(request: Request, file: UploadFile = File(...), db: Session = Depends(get_db),user_id: int = Depends(require_login)):
-    contents = await file.read()
-    # image = Image.open(io.BytesIO(contents)).convert("RGB")
-    # image_path = os.path.join(UPLOAD_DIR, f"{uuid.uuid4()}.jpg")
-    # image.save(image_path)
-    image = Image.open(io.BytesIO(contents)).convert("RGB")
-
-        
-
-    # Save image to static folder (optional, for display)
-    image_filename = f"upload_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.png"
-    image_path = os.path.join(STATIC_DIR, image_filename)
-    image.save(image_path)
-
-    label, confidence = model_loader.classify_image(contents)
-    material, recyclable, co2 = carbon_utils.estimate_impact(label, carbon_df)
-
-    # Save to database
-    username = request.session.get("username", "guest")
-    # new_entry = WasteLog(label=label, confidence=confidence, material=material, recyclable=recyclable, co2_estimate=co2)
-    new_entry = WasteLog(
-    label=label,
-    confidence=confidence,
-    material=material,
-    recyclable=recyclable,
-    co2_estimate=co2,
-    username=username,
-    filename=image_filename,
-
-    )
-    db.add(new_entry)
-    db.commit()
+async def classify_image(
+    request: Request,
+    file: UploadFile = File(...),
+    user_id: int = Depends(require_login),
+    _model_ready: None = Depends(require_model_ready),
+):
+    async with concurrency.classify_admission.slot():
+        # Size cap, format sniff and header check; the hash is computed while reading
+        with metrics.timer("upload_read"):
+            incoming = await uploads.read_upload(file)
+            contents = incoming.read()
+        content_hash = incoming.content_hash
+
+        # Repeat and near-duplicate uploads skip the model entirely
+        try:
+            image_filename, output = await pipeline.classify_upload(contents, content_hash)
+        except preprocessing.ImageTooLarge:
+            raise HTTPException(status_code=413, detail="image dimensions too large")
+        except pipeline.UnreadableImage:  # passed the sniff but Pillow cannot decode it
+            raise HTTPException(status_code=415, detail="not a readable image")
+        # Carbon impact from the current carbon table, cached or not
+        label, confidence, material, recyclable, co2 = model_loader.estimate(output)
+
+        # Save to database
+        username = request.session.get("username", "guest")
+        # Group-committed by the write-behind writer. Waiting (the default) keeps the
+        # row durable before the response and visible on the dashboard right after.
+        written = pipeline.log_writer.submit([dict(
+            label=label,
+            confidence=confidence,
+            material=material,
+            recyclable=recyclable,
+            co2_estimate=co2,
+            username=username,
+            filename=image_filename,
+        )])
+        if pipeline.WAIT_FOR_COMMIT:
+            with metrics.timer("db_wait"):
+                await asyncio.wrap_future(written)
 
     return templates.TemplateResponse("result.html", {
         "request": request,
-        "image_path": f"/static/{os.path.basename(image_path)}",
+        "image_path": f"/static/{image_filename}",
+        "thumb_path": thumbnails.url(image_filename, "md"),
         "label": label,
         "confidence": f"{confidence:.2%}",
         "material": material,
@@ -138,26 +217,110 @@ async def classify_image(request: Request, file: UploadFile = File(...), db: Ses
         "co2": co2
     })
 
+@app.get("/metrics")
+def prometheus_metrics():
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/stats/inference")
+def inference_stats():
+    return {
+        **model_loader.scheduler.stats(),
+        "cache": result_cache.stats(),
+        "near_duplicates": pipeline.near_duplicates.stats(),
+        "log_writer": pipeline.log_writer.stats(),
+    }
+
 # @app.get("/log")
 # def view_log(request: Request, db: Session = Depends(get_db)):
 #     logs = db.query(WasteLog).all()
 #     return templates.TemplateResponse("waste_log.html", {"request": request, "logs": logs})
+def _parse_log_filters(date_from, date_to, material, recyclable):
+    # Blank form fields mean "no filter"
+    try:
+        return log_queries.LogFilters(
+            date.fromisoformat(date_from) if date_from else None,
+            date.fromisoformat(date_to) if date_to else None,
+            material or None,
+            {"true": True, "false": False}[recyclable.lower()] if recyclable else None,
+        )
+    except (ValueError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid filter")
+
+
+def _log_page(db, username, cursor, limit, date_from, date_to, material, recyclable):
+    filters = _parse_log_filters(date_from, date_to, material, recyclable)
+    try:
+        logs, next_cursor = log_queries.fetch_page(db, username, filters, cursor, limit)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return filters, logs, next_cursor, log_queries.totals(db, username, filters)
+
+
 @app.get("/log")
-def view_log(request: Request, db: Session = Depends(get_db),user_id: int = Depends(require_login)):
+def view_log(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(log_queries.DEFAULT_PAGE_SIZE, ge=1, le=log_queries.MAX_PAGE_SIZE),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    material: Optional[str] = None,
+    recyclable: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(require_login),
+):
     username = request.session.get("username")
-    # logs = db.query(WasteLog).all()
-    logs = db.query(WasteLog).filter(WasteLog.username == username).all()
-    total_co2 = sum(entry.co2_estimate for entry in logs if entry.co2_estimate)
-    total_entries = len(logs)
-    recyclable_count = sum(1 for entry in logs if entry.recyclable)
-    percent_recyclable = (recyclable_count / total_entries * 100) if total_entries else 0
+    filters, logs, next_cursor, totals = _log_page(db, username, cursor, limit, date_from, date_to, material, recyclable)
+
+    next_url = None
+    if next_cursor:
+        params = {k: v for k, v in request.query_params.items() if k != "cursor"}
+        next_url = f"/log?{urlencode({**params, 'cursor': next_cursor})}"
+
     return templates.TemplateResponse("waste_log.html", {
         "request": request,
         "logs": logs,
-        "total_co2": round(total_co2, 2),
-        "percent_recyclable": round(percent_recyclable, 2)
+        "filters": filters,
+        "next_url": next_url,
+        "is_first_page": not cursor,
+        "total_co2": totals["total_co2"],
+        "percent_recyclable": totals["percent_recyclable"],
+        "total_entries": totals["total_entries"],
     })
 
+
+@app.get("/api/log")
+def view_log_json(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(log_queries.DEFAULT_PAGE_SIZE, ge=1, le=log_queries.MAX_PAGE_SIZE),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    material: Optional[str] = None,
+    recyclable: Optional[str] = None,
+    db: Session = Depends(get_db),
+    user_id: int = Depends(require_login),
+):
+    username = request.session.get("username")
+    filters, logs, next_cursor, totals = _log_page(db, username, cursor, limit, date_from, date_to, material, recyclable)
+    return {
+        "items": [
+            {
+                "id": entry.id,
+                "timestamp": entry.timestamp.isoformat(),
+                "label": entry.label,
+                "confidence": entry.confidence,
+                "material": entry.material,
+                "recyclable": entry.recyclable,
+                "co2_estimate": entry.co2_estimate,
+                "filename": entry.filename,
+            }
+            for entry in logs
+        ],
+        "next_cursor": next_cursor,
+        "totals": totals,
+    }
+
 # @app.get("/dashboard")
 # def dashboard(request: Request, db: Session = Depends(get_db), user_id: int = Depends(require_login)):
 #     username = request.session.get("username")
@@ -185,27 +348,14 @@ def view_log(request: Request, db: Session = Depends(get_db),user_id: int = Depe
 
 @app.get("/public")
 def public_dashboard(request: Request, db: Session = Depends(get_db)):
-    # Get all users
-    users = db.query(user.User).all()
-
-    leaderboard = []
-
-    for u in users:
-        logs = db.query(WasteLog).filter(WasteLog.username == u.username).all()
-        total_entries = len(logs)
-        total_co2 = sum(log.co2_estimate for log in logs if log.co2_estimate)
-        recyclable_count = sum(1 for log in logs if log.recyclable)
-        recyclable_percent = (recyclable_count / total_entries * 100) if total_entries else 0
-
-        leaderboard.append({
-            "username": u.username,
-            "total_co2": round(total_co2, 2),
-            "recyclable_percent": round(recyclable_percent, 2),
-            "total_entries": total_entries
+    html = leaderboard_cache.get("public")
+    if html is None:
+        # Single ordered query over the per-user aggregate table
+        with metrics.timer("leaderboard_query"):
+            leaderboard = aggregates.leaderboard(db)
+        html = templates.get_template("public_dashboard.html").render({
+            "request": request,
+            "leaderboard": leaderboard,
         })
-    leaderboard.sort(key=lambda x: (x['total_co2'], -x['recyclable_percent']))
-
-    return templates.TemplateResponse("public_dashboard.html", {
-        "request": request,
-        "leaderboard": leaderboard
-    })
+        leaderboard_cache.set("public", html)
+    return HTMLResponse(html)
@@ -0,0 +1,222 @@
+# waste_logger_app/metrics.py
+#
+# In-process latency histograms and counters, rendered in the Prometheus text
+# format at /metrics. Code wraps each stage in `with metrics.timer("stage"):`;
+# the observation goes into the stage histogram and, when the stage runs on
+# behalf of a request, into that request's Server-Timing list.
+#
+# Settings:
+#   WASTE_LOGGER_SERVER_TIMING=1           add a Server-Timing header to responses
+#   WASTE_LOGGER_PROFILE_SAMPLE_RATE=0.01  profile this fraction of requests...
+#   WASTE_LOGGER_PROFILE_SLOW_MS=500       ...and keep the dump when slower than this
+#   WASTE_LOGGER_PROFILE_DIR=profiles      where the .prof files go (open with pstats/snakeviz)
+
+import bisect
+import contextvars
+import cProfile
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+SERVER_TIMING = os.environ.get("WASTE_LOGGER_SERVER_TIMING", "0") == "1"
+PROFILE_SAMPLE_RATE = float(os.environ.get("WASTE_LOGGER_PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_MS = float(os.environ.get("WASTE_LOGGER_PROFILE_SLOW_MS", "500"))
+PROFILE_DIR = os.environ.get("WASTE_LOGGER_PROFILE_DIR", "profiles")
+
+# Seconds; spans cached hits (~ms) through cold model loads
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# (stage, seconds) pairs for the current request; None outside requests
+_request_timings = contextvars.ContextVar("request_timings", default=None)
+
+
+def _format_labels(labelnames, values, extra=()):
+    pairs = list(zip(labelnames, values)) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (f'{name}="{_escape(value)}"' for name, value in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Counter:
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}  # labels -> [per-bucket counts (+Inf last), sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labels, list(counts), total, count) for labels, (counts, total, count) in self._series.items())
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, [('le', le)])} {cumulative}")
+            label_text = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_text} {total}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Gauge:
+    # Read from a callback at scrape time (queue depths, in-flight counts)
+    def __init__(self, name, documentation, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def render(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {self.read()}"]
+
+
+_registry = []
+
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+
+def gauge(name, documentation, read):
+    return _register(Gauge(name, documentation, read))
+
+
+stage_seconds = _register(Histogram(
+    "waste_logger_stage_seconds", "Time spent in each processing stage", ["stage"],
+))
+request_seconds = _register(Histogram(
+    "waste_logger_request_seconds", "HTTP request latency by route", ["method", "route"],
+))
+requests_total = _register(Counter(
+    "waste_logger_requests_total", "HTTP requests by route and status", ["method", "route", "status"],
+))
+profiles_written = _register(Counter(
+    "waste_logger_profiles_written_total", "Slow-request cProfile dumps written",
+))
+
+
+def observe(stage, seconds):
+    stage_seconds.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((stage, seconds))
+
+
+@contextmanager
+def timer(stage):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def render():
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+def server_timing_header(timings, total):
+    # Repeated stages (e.g. two cache lookups) are summed into one entry
+    merged = {}
+    for stage, seconds in timings:
+        merged[stage] = merged.get(stage, 0.0) + seconds
+    entries = [f"{stage};dur={seconds * 1000:.2f}" for stage, seconds in merged.items()]
+    entries.append(f"total;dur={total * 1000:.2f}")
+    return ", ".join(entries)
+
+
+# cProfile hooks the calling thread, so only one request is profiled at a time
+_profile_lock = threading.Lock()
+
+
+def _route_name(request):
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+async def middleware(request, call_next):
+    # Registered with app.middleware("http") in main.py
+    timings = []
+    token = _request_timings.set(timings)
+
+    profiler = None
+    if PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE and _profile_lock.acquire(blocking=False):
+        # Profiles the event loop thread, so overlapping requests on it show up too
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        elapsed = time.perf_counter() - started
+        _request_timings.reset(token)
+        if profiler is not None:
+            profiler.disable()
+            try:
+                if elapsed * 1000 >= PROFILE_SLOW_MS:
+                    _dump_profile(profiler, request, elapsed)
+            finally:
+                _profile_lock.release()
+
+        route = _route_name(request)
+        request_seconds.observe(elapsed, request.method, route)
+        requests_total.inc(request.method, route, status)
+
+    if SERVER_TIMING:
+        response.headers["Server-Timing"] = server_timing_header(timings, elapsed)
+    return response
+
+
+def _dump_profile(profiler, request, elapsed):
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    route = _route_name(request).strip("/").replace("/", "_").replace("{", "").replace("}", "") or "root"
+    path = os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{route}-{int(elapsed * 1000)}ms.prof")
+    profiler.dump_stats(path)
+    profiles_written.inc()
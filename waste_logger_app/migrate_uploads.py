@@ -0,0 +1,56 @@
+import argparse
+import os
+
+from waste_logger_app.database import SessionLocal, WasteLog
+from waste_logger_app.image_store import ImageStore, STATIC_DIR
+
+IMAGE_EXTENSIONS = {".png": ".png", ".jpg": ".jpg", ".jpeg": ".jpg", ".webp": ".webp", ".gif": ".gif"}
+
+
+def migrate_uploads(keep_originals=False):
+    # Fold loose static/ images that waste_logs points at (upload_<timestamp>.png
+    # etc.) into the content-addressed store and repoint the rows. Files no row
+    # references, such as the images the legacy waste_log.csv import reads, are
+    # left where they are.
+    store = ImageStore()
+    db = SessionLocal()
+    moved, stored, rows = [], set(), 0
+    try:
+        referenced = {
+            filename for (filename,) in db.query(WasteLog.filename).filter(WasteLog.filename.isnot(None)).distinct()
+        }
+        for name in sorted(referenced):
+            path = os.path.join(STATIC_DIR, name)
+            extension = IMAGE_EXTENSIONS.get(os.path.splitext(name)[1].lower())
+            if os.path.dirname(name) or extension is None or not os.path.isfile(path):
+                continue
+
+            with open(path, "rb") as f:
+                data = f.read()
+            new_name = store.put(data, extension)
+            stored.add(new_name)
+
+            rows += (
+                db.query(WasteLog)
+                .filter(WasteLog.filename == name)
+                .update({WasteLog.filename: new_name}, synchronize_session=False)
+            )
+            moved.append(path)
+        db.commit()
+    finally:
+        db.close()
+
+    # Only remove originals once the database points at the store, and only
+    # the ones this run moved
+    if not keep_originals:
+        for path in moved:
+            os.remove(path)
+
+    print(f"Migrated {len(moved)} files into {len(stored)} stored images, updated {rows} log rows.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move static/ uploads into the content-addressed image store")
+    parser.add_argument("--keep-originals", action="store_true", help="leave the old files in static/")
+    args = parser.parse_args()
+    migrate_uploads(keep_originals=args.keep_originals)
@@ -1,20 +1,246 @@
 # model_loader.py
-from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras.applications.mobilenet_v2 import preprocess_input, decode_predictions
-import tensorflow as tf
+#
+# The inference backend (Keras, TFLite or ONNX Runtime) is loaded lazily:
+# importing this module is cheap, start_background_load() builds and warms the
+# model on a thread at app startup, and predict_batch() loads it on first use
+# otherwise.
 import numpy as np
-from PIL import Image
-import io
+import json
+import os
+import threading
+import time
+from collections import namedtuple
 
-model = MobileNetV2(weights="imagenet")  # No file needed
+from waste_logger_app import carbon_utils, inference_backends
+from waste_logger_app.metrics import timer
+from waste_logger_app.inference_scheduler import InferenceScheduler
+from waste_logger_app.preprocessing import prepare_image
 
-def classify_image(image_bytes):
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGB").resize((224, 224))
-    image_array = np.array(image)
-    image_array = preprocess_input(image_array)
-    image_array = np.expand_dims(image_array, axis=0)
+# Inference engine: keras (default), tflite, onnx or remote - see inference_backends.py
+BACKEND = os.environ.get("WASTE_LOGGER_BACKEND", "keras")
+
+# Cached results are keyed by this name, the engine and a content hash of the
+# loaded weights or model file, so replacing the artifact invalidates them.
+# Backends differ slightly numerically, so each gets its own cache entries.
+BASE_MODEL_VERSION = os.environ.get("WASTE_LOGGER_MODEL_VERSION", "mobilenet_v2-imagenet-1")
+
+
+def model_version_for(backend):
+    # backend: a loaded local backend (see inference_backends.artifact_digest)
+    version = f"{BASE_MODEL_VERSION}-{backend.name}"
+    digest = getattr(backend, "artifact_digest", None)
+    return f"{version}-{digest}" if digest else version
+
+
+# Only known once the artifact has been loaded (remote workers learn it from
+# the inference server's handshake): None until then
+MODEL_VERSION = None
+
+# Local .h5 weights for offline hosts; falls back to the Keras "imagenet" download
+WEIGHTS_PATH = os.environ.get("WASTE_LOGGER_WEIGHTS_PATH")
+
+# Micro-batching settings (override through the environment)
+MAX_BATCH_SIZE = int(os.environ.get("WASTE_LOGGER_MAX_BATCH_SIZE", "16"))
+MAX_WAIT_MS = float(os.environ.get("WASTE_LOGGER_MAX_BATCH_WAIT_MS", "10"))
+
+# A failed background load is retried after this long, doubling with every
+# consecutive failure up to LOAD_RETRY_MAX_SECONDS
+LOAD_RETRY_SECONDS = float(os.environ.get("WASTE_LOGGER_LOAD_RETRY_SECONDS", "5"))
+LOAD_RETRY_MAX_SECONDS = float(os.environ.get("WASTE_LOGGER_LOAD_RETRY_MAX_SECONDS", "300"))
+
+# Number of top classes averaged into the expected CO2 estimate
+CO2_TOP_K = int(os.environ.get("WASTE_LOGGER_CO2_TOP_K", "5"))
+
+# Same file (and hash) Keras' decode_predictions uses; a local copy can be given instead
+CLASS_INDEX_URL = "https://storage.googleapis.com/download.tensorflow.org/data/imagenet_class_index.json"
+CLASS_INDEX_PATH = os.environ.get("WASTE_LOGGER_CLASS_INDEX_PATH")
+
+# What the model produced for one image: its top class plus the top-k class ids
+# and probabilities, best first. This is what the caches keep; the carbon fields
+# are derived from it by estimate() against the current carbon table.
+ModelOutput = namedtuple("ModelOutput", ["label", "confidence", "top_classes", "top_probs"])
+Prediction = namedtuple("Prediction", ["label", "confidence", "material", "recyclable", "co2_kg"])
+
+model = None
+class_names = None
+
+_load_lock = threading.Lock()
+_start_lock = threading.Lock()
+_ready = threading.Event()
+_loader = None  # background load thread
+_retry_at = 0.0  # time.monotonic() before which a failed load is not retried
+_state = {"status": "not_loaded", "error": None, "failures": 0, "load_seconds": None, "warmup_seconds": None}
+_version_listeners = []
+
+
+def on_model_version(callback):
+    # callback(MODEL_VERSION), now if it is known, otherwise once the model
+    # has been loaded (before it reports ready)
+    _version_listeners.append(callback)
+    if MODEL_VERSION is not None:
+        callback(MODEL_VERSION)
+
+
+def warmup_batch_sizes(max_batch_size=MAX_BATCH_SIZE):
+    # Powers of two up to the largest batch the scheduler will form
+    sizes, size = [], 1
+    while size < max_batch_size:
+        sizes.append(size)
+        size *= 2
+    sizes.append(max_batch_size)
+    return sizes
+
+
+def _class_index_path():
+    # Explicit path, then a copy next to converted models, then the Keras cache
+    candidates = [
+        CLASS_INDEX_PATH,
+        os.path.join(inference_backends.MODELS_DIR, "imagenet_class_index.json"),
+        os.path.join(os.path.expanduser("~"), ".keras", "models", "imagenet_class_index.json"),
+    ]
+    for path in candidates:
+        if path and os.path.exists(path):
+            return path
+    return None
+
+
+def load_class_names():
+    path = _class_index_path()
+    if path is None:
+        from tensorflow.keras.utils import get_file
+
+        path = get_file(
+            "imagenet_class_index.json",
+            CLASS_INDEX_URL,
+            cache_subdir="models",
+            file_hash="c2c37ea517e94d9795004a39431a14cb",
+        )
+    with open(path) as f:
+        class_index = json.load(f)
+    return [class_index[str(i)][1] for i in range(len(class_index))]
+
+
+def preprocess_input(image_array):
+    # Same scaling as keras.applications.mobilenet_v2.preprocess_input, without importing TF
+    return image_array.astype("float32") / 127.5 - 1.0
 
-    predictions = model.predict(image_array)
-    decoded = decode_predictions(predictions, top=1)[0][0]  # (class_id, label, confidence)
 
-    return decoded[1], float(decoded[2])  # label, confidence
\ No newline at end of file
+def load_model(warmup=True):
+    global model, class_names, _retry_at, MODEL_VERSION
+    with _load_lock:
+        if model is not None:
+            return model
+        _state["status"] = "loading"
+        try:
+            started = time.monotonic()
+            if BACKEND == "keras":
+                built = inference_backends.create_backend(BACKEND, weights_path=WEIGHTS_PATH)
+            else:
+                built = inference_backends.create_backend(BACKEND)
+            class_names = load_class_names()
+            _state["load_seconds"] = round(time.monotonic() - started, 3)
+
+            if warmup:
+                # Trace the predict graph for every batch size before real traffic
+                _state["status"] = "warming_up"
+                started = time.monotonic()
+                dtype = getattr(built, "input_dtype", "float32")
+                for size in warmup_batch_sizes():
+                    built.predict(np.zeros((size, 224, 224, 3), dtype=dtype))
+                _state["warmup_seconds"] = round(time.monotonic() - started, 3)
+
+            # Remote workers share entries with the engine the inference server runs
+            version = built.model_version if BACKEND == "remote" else model_version_for(built)
+            for callback in _version_listeners:
+                callback(version)
+            MODEL_VERSION = version
+        except Exception as exc:
+            _state["status"] = "error"
+            _state["error"] = repr(exc)
+            _state["failures"] += 1
+            backoff = LOAD_RETRY_SECONDS * 2 ** (_state["failures"] - 1)
+            _retry_at = time.monotonic() + min(backoff, LOAD_RETRY_MAX_SECONDS)
+            raise
+
+        model = built
+        _state["status"] = "ready"
+        _state["error"] = None
+        _ready.set()
+        return model
+
+
+def start_background_load():
+    # Idempotent, so every caller that needs the model can call it: starts a
+    # load unless one is running, the model is ready, or the last attempt
+    # failed less than the backoff ago. Returns the load thread, if any.
+    global _loader
+    with _start_lock:
+        if _ready.is_set() or (_loader is not None and _loader.is_alive()) or retry_after() > 0:
+            return _loader
+        _loader = threading.Thread(target=_load_quietly, name="model-loader", daemon=True)
+        _loader.start()
+        return _loader
+
+
+def _load_quietly():
+    try:
+        load_model()
+    except Exception:
+        pass  # recorded in _state and reported by /readyz
+
+
+def is_ready():
+    return _ready.is_set()
+
+
+def retry_after():
+    # Seconds until a failed load may be retried (0 when it may be now)
+    return max(0.0, _retry_at - time.monotonic())
+
+
+def status():
+    return dict(
+        _state,
+        ready=is_ready(),
+        retry_in_seconds=round(retry_after(), 1) if _state["status"] == "error" else None,
+        backend=BACKEND,
+        model_version=MODEL_VERSION,
+    )
+
+
+def predict_batch(arrays):
+    # arrays: list of uint8 (224, 224, 3) arrays from preprocessing -> list of ModelOutput
+    loaded = model if model is not None else load_model()
+    with timer("model_predict"):
+        if getattr(loaded, "input_dtype", "float32") == "uint8":
+            # The remote backend scales on the server side
+            probs = loaded.predict(np.stack(arrays))
+        else:
+            probs = loaded.predict(preprocess_input(np.stack(arrays)))
+
+    top_classes, top_probs = carbon_utils.get_class_vectors(class_names).top_k(probs, top_k=CO2_TOP_K)
+    return [
+        ModelOutput(class_names[classes[0]], float(weights[0]), tuple(map(int, classes)), tuple(map(float, weights)))
+        for classes, weights in zip(top_classes, top_probs)
+    ]
+
+
+def estimate(output):
+    # ModelOutput, fresh or cached -> Prediction. The carbon fields always come
+    # from the current carbon table, so edits to the CSV apply to cached results too.
+    label, confidence, top_classes, top_probs = output
+    with timer("carbon_lookup"):
+        material, recyclable, co2_kg = carbon_utils.get_class_vectors(class_names).impact(top_classes, top_probs)
+    return Prediction(label, confidence, material, recyclable, co2_kg)
+
+
+scheduler = InferenceScheduler(predict_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS)
+
+
+def submit_array(image_array):
+    # Returns a concurrent.futures.Future resolving to a ModelOutput
+    return scheduler.submit(image_array)
+
+
+def classify_image(image_bytes):
+    return estimate(submit_array(prepare_image(image_bytes).array).result())  # Prediction
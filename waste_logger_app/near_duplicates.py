@@ -0,0 +1,147 @@
+# waste_logger_app/near_duplicates.py
+#
+# Near-duplicate lookup in front of the model. Uploads that differ only in
+# recompression, a slight crop or EXIF miss the exact-bytes cache but have
+# almost the same perceptual hash (preprocessing.dhash). Every classified
+# image's hash goes into an in-memory multi-index hash table; an upload within
+# `max_distance` bits of a known image reuses that image's model output.
+#
+# Both limits are deliberately conservative. On the benchmark set
+# (benchmarks/near_duplicates.py) distinct pictures were as close as 5 bits,
+# so 2 bits keeps a 3-bit margin while still catching recompression, resizing
+# and EXIF edits. Only predictions the model was reasonably sure of are
+# reused; for a borderline label a small crop may well tip the class.
+#
+# Flat or low-texture images (solid colours, blank pages, smooth gradients)
+# have almost no brighter/darker edges, so their hashes are all zeros or all
+# ones whatever the picture: a red and a blue square hash the same. Hashes
+# with fewer than MIN_HASH_BITS set (or unset) bits are neither indexed nor
+# looked up; those uploads go to the model.
+#
+# Hashes are persisted in image_hashes, keyed by content hash; model outputs
+# come from classification_cache, so only entries for the current model
+# version are loaded. Set WASTE_LOGGER_NEAR_DUPLICATE_DISTANCE=-1 to disable.
+
+import os
+import threading
+
+from waste_logger_app.classification_cache import decode_top
+from waste_logger_app.database import SessionLocal, ClassificationCacheEntry, ImageHash
+from waste_logger_app.utils.hamming_index import MultiIndexHash
+
+MAX_DISTANCE = int(os.environ.get("WASTE_LOGGER_NEAR_DUPLICATE_DISTANCE", "2"))
+MIN_CONFIDENCE = float(os.environ.get("WASTE_LOGGER_NEAR_DUPLICATE_MIN_CONFIDENCE", "0.5"))
+MIN_HASH_BITS = int(os.environ.get("WASTE_LOGGER_NEAR_DUPLICATE_MIN_BITS", "8"))
+HASH_BITS = 64
+
+_SIGN_BIT = 1 << 63
+_MASK = (1 << 64) - 1
+
+
+def to_signed(value):
+    # SQLite integers are signed 64-bit
+    return value - (1 << 64) if value & _SIGN_BIT else value
+
+
+def to_unsigned(value):
+    return value & _MASK
+
+
+def informative(dhash, min_bits=MIN_HASH_BITS):
+    # Enough edges for the hash to tell pictures apart (see the note above)
+    ones = bin(dhash).count("1")
+    return min_bits <= ones <= HASH_BITS - min_bits
+
+
+class NearDuplicateIndex:
+    def __init__(
+        self, model_version, max_distance=MAX_DISTANCE, min_confidence=MIN_CONFIDENCE, session_factory=SessionLocal
+    ):
+        self.model_version = model_version
+        self.max_distance = max_distance
+        self.min_confidence = min_confidence
+        self.session_factory = session_factory
+        self.table = MultiIndexHash(max(max_distance, 0))
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.low_information = 0
+
+    @property
+    def enabled(self):
+        return self.max_distance >= 0
+
+    def load(self):
+        # Rebuild the table from image_hashes joined with current-model cache entries
+        if not self.enabled:
+            return 0
+        db = self.session_factory()
+        try:
+            rows = (
+                db.query(
+                    ImageHash.dhash,
+                    ClassificationCacheEntry.label,
+                    ClassificationCacheEntry.confidence,
+                    ClassificationCacheEntry.top_classes,
+                )
+                .join(ClassificationCacheEntry, ClassificationCacheEntry.content_hash == ImageHash.content_hash)
+                .filter(ClassificationCacheEntry.model_version == self.model_version)
+                .all()
+            )
+        finally:
+            db.close()
+        table = MultiIndexHash(self.max_distance)
+        for dhash, label, confidence, top_classes in rows:
+            dhash = to_unsigned(dhash)
+            output = (label, confidence, *decode_top(top_classes))
+            if informative(dhash) and self._reusable(output):
+                table.add(dhash, output)
+        with self._lock:
+            self.table = table
+        return len(table)
+
+    def lookup(self, dhash):
+        # Model output of the nearest known image within max_distance, or None.
+        # In memory and a few bucket probes: safe to call from the event loop.
+        if not self.enabled:
+            return None
+        if not informative(dhash):
+            with self._lock:
+                self.low_information += 1
+            return None
+        with self._lock:
+            matches = self.table.search(dhash)
+            if not matches:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return matches[0][1]
+
+    def add(self, content_hash, dhash, output):
+        # Blocking: run on the db executor
+        if not self.enabled:
+            return
+        if informative(dhash) and self._reusable(output):
+            with self._lock:
+                self.table.add(dhash, tuple(output))
+        # Persisted either way, so a lower min_confidence takes effect on the next load
+        db = self.session_factory()
+        try:
+            db.merge(ImageHash(content_hash=content_hash, dhash=to_signed(dhash)))
+            db.commit()
+        finally:
+            db.close()
+
+    def _reusable(self, output):
+        # output: (label, confidence, top_classes, top_probs)
+        confidence = output[1]
+        return confidence is not None and confidence >= self.min_confidence
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self.table),
+                "hits": self.hits,
+                "misses": self.misses,
+                "low_information": self.low_information,
+            }
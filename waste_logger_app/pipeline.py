@@ -0,0 +1,137 @@
+# waste_logger_app/pipeline.py
+#
+# Upload -> stored image + prediction -> WasteLog, shared by the single
+# /classify route, the batch endpoint and offline tools. Functions here are
+# blocking (request handlers run them on the executors in concurrency.py),
+# except classify_upload.
+
+import asyncio
+import os
+
+from waste_logger_app import aggregates, classification_cache, concurrency, image_store, live_updates, model_loader, preprocessing
+from waste_logger_app import thumbnails  # also registers the on-write thumbnail hook
+from waste_logger_app.database import SessionLocal, WasteLog
+from waste_logger_app.metrics import timer
+from waste_logger_app.near_duplicates import NearDuplicateIndex
+from waste_logger_app.write_behind import WriteBehindQueue
+
+# Group commit window for WasteLog inserts from request handlers
+GROUP_COMMIT_ROWS = int(os.environ.get("WASTE_LOGGER_GROUP_COMMIT_ROWS", "256"))
+GROUP_COMMIT_MS = float(os.environ.get("WASTE_LOGGER_GROUP_COMMIT_MS", "20"))
+# Whether /classify waits for its row to be committed before responding
+WAIT_FOR_COMMIT = os.environ.get("WASTE_LOGGER_WAIT_FOR_COMMIT", "1") != "0"
+
+result_cache = classification_cache.ClassificationCache(model_loader.MODEL_VERSION)
+near_duplicates = NearDuplicateIndex(model_loader.MODEL_VERSION)
+
+
+def use_model_version(version):
+    # Point both caches at `version`: drops other versions' cache entries and
+    # rebuilds the near-duplicate index (see model_loader.on_model_version)
+    result_cache.model_version = version
+    result_cache.purge_stale()
+    near_duplicates.model_version = version
+    near_duplicates.load()
+
+
+def store_artifact(contents, content_hash, artifact, extension):
+    # Original bytes share the upload's hash; re-encoded artifacts are hashed by the store.
+    # The write itself happens in the background on the store's executor.
+    digest = content_hash if artifact is contents else None
+    filename, _ = image_store.store.put_async(artifact, extension, digest=digest)
+    return filename
+
+
+def prepare_upload(contents, content_hash):
+    # One decode gives both the model input and the artifact we store
+    prepared = preprocessing.prepare_image(contents)
+    return prepared, store_artifact(contents, content_hash, prepared.artifact, prepared.extension)
+
+
+def store_upload(contents, content_hash):
+    # Cache hit: no model input needed, only the stored artifact
+    return store_artifact(contents, content_hash, *preprocessing.prepare_artifact(contents))
+
+
+def remember(content_hash, dhash, output):
+    # After a model prediction: exact-bytes cache plus the near-duplicate index.
+    # Near-duplicate hits only go into the exact cache, so matches cannot drift
+    # further and further from the image the model actually saw.
+    result_cache.put(content_hash, output)
+    near_duplicates.add(content_hash, dhash, output)
+
+
+class UnreadableImage(ValueError):
+    # The upload passed the format sniff but Pillow cannot decode it. Kept apart
+    # from OSError so connection errors from a remote backend are not reported as such.
+    pass
+
+
+async def _decode(fn, *args):
+    try:
+        return await concurrency.run_cpu(fn, *args)
+    except preprocessing.ImageTooLarge:
+        raise
+    except OSError as exc:  # PIL raises UnidentifiedImageError (an OSError) for non-images
+        raise UnreadableImage(str(exc)) from exc
+
+
+async def classify_upload(contents, content_hash):
+    # The one coroutine here: shared by /classify and the batch endpoint so each
+    # step runs where it belongs - decode/encode on the CPU pool, cache reads and
+    # writes on the db pool, the model through the scheduler - and the event loop
+    # only waits. -> (stored filename, model output); raises
+    # preprocessing.ImageTooLarge or UnreadableImage.
+    with timer("cache_lookup"):
+        cached = result_cache.get_memory(content_hash)
+        if cached is None:
+            cached = await concurrency.run_db(result_cache.get, content_hash)
+    if cached is not None:
+        return await _decode(store_upload, contents, content_hash), cached
+
+    prepared, filename = await _decode(prepare_upload, contents, content_hash)
+    # A visually identical earlier upload (recompressed, cropped, new EXIF) also skips the model
+    with timer("near_duplicate_lookup"):
+        output = near_duplicates.lookup(prepared.dhash)
+    if output is not None:
+        await concurrency.run_db(result_cache.put, content_hash, output)
+        return filename, output
+
+    # Await the batched prediction so concurrent uploads can share a predict call
+    with timer("model_wait"):
+        output = await asyncio.wrap_future(model_loader.submit_array(prepared.array))
+    await concurrency.run_db(remember, content_hash, prepared.dhash, output)
+    return filename, output
+
+
+def insert_logs(rows):
+    # rows: list of WasteLog column dicts, written in one transaction
+    db = SessionLocal()
+    try:
+        with timer("db_insert"):
+            entries = aggregates.record_waste_logs(db, [WasteLog(**fields) for fields in rows])
+            changes = [_live_change(entry) for entry in entries]
+        with timer("db_commit"):
+            db.commit()
+    finally:
+        db.close()
+    live_updates.broadcaster.publish(changes)
+
+
+def _live_change(entry):
+    # What the dashboard stream needs from a committed row (read before commit expires it)
+    return {
+        "username": entry.username,
+        "day": entry.timestamp.date(),
+        "recent": {
+            "label": entry.label,
+            "co2_estimate": entry.co2_estimate,
+            "recyclable": entry.recyclable,
+            "timestamp": entry.timestamp.strftime("%Y-%m-%d %H:%M"),
+            "thumb": thumbnails.url(entry.filename),
+        },
+    }
+
+
+# Request handlers submit rows here instead of committing themselves
+log_writer = WriteBehindQueue(insert_logs, max_rows=GROUP_COMMIT_ROWS, max_delay_ms=GROUP_COMMIT_MS)
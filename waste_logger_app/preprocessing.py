@@ -0,0 +1,96 @@
+# waste_logger_app/preprocessing.py
+#
+# Decode-once preprocessing shared by main.py and model_loader: one PIL decode
+# produces both the 224x224 model input and the artifact we store for display.
+
+import io
+import os
+import warnings
+from collections import namedtuple
+
+import numpy as np
+from PIL import Image
+
+from waste_logger_app.metrics import timer
+
+MODEL_INPUT_SIZE = (224, 224)
+
+# Decompression-bomb limit, checked against the header before anything is decoded.
+# Pillow only warns between MAX_IMAGE_PIXELS and twice that; make it refuse instead.
+MAX_IMAGE_PIXELS = int(os.environ.get("WASTE_LOGGER_MAX_IMAGE_PIXELS", str(40_000_000)))
+Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+warnings.simplefilter("error", Image.DecompressionBombWarning)
+
+# Formats a browser can show as-is: store the uploaded bytes instead of re-encoding
+PASSTHROUGH_FORMATS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp", "GIF": ".gif"}
+
+# Side of the dHash grid: HASH_SIZE * HASH_SIZE bits
+HASH_SIZE = 8
+
+# array: uint8 (224, 224, 3); artifact: encoded bytes to store; extension: e.g. ".jpg";
+# dhash: perceptual hash of the model input (see dhash())
+PreparedImage = namedtuple("PreparedImage", ["array", "artifact", "extension", "dhash"])
+
+
+class ImageTooLarge(OSError):
+    # An OSError like UnidentifiedImageError, so every "not a readable image" path catches it
+    pass
+
+
+def open_image(contents):
+    # Reads the header only; refuses images whose dimensions exceed MAX_IMAGE_PIXELS
+    try:
+        image = Image.open(io.BytesIO(contents))
+    except (Image.DecompressionBombError, Image.DecompressionBombWarning) as exc:
+        raise ImageTooLarge(str(exc)) from exc
+    if image.width * image.height > MAX_IMAGE_PIXELS:
+        raise ImageTooLarge(f"{image.width}x{image.height} image exceeds {MAX_IMAGE_PIXELS} pixels")
+    return image
+
+
+def decode_for_model(image):
+    # JPEG draft mode lets libjpeg decode at 1/2, 1/4 or 1/8 scale, so a
+    # 12-megapixel photo is never fully decoded just to be shrunk to 224x224.
+    if image.format == "JPEG":
+        image.draft("RGB", MODEL_INPUT_SIZE)
+    with timer("decode"):
+        rgb = image.convert("RGB")
+        return rgb, np.asarray(rgb.resize(MODEL_INPUT_SIZE), dtype=np.uint8)
+
+
+def dhash(array):
+    # Difference hash: is each pixel brighter than its right neighbour on a
+    # 9x8 greyscale thumbnail. Recompression, resizing and metadata changes
+    # barely move it, so near-identical photos land a few bits apart.
+    small = Image.fromarray(array).convert("L").resize((HASH_SIZE + 1, HASH_SIZE), Image.BILINEAR)
+    pixels = np.asarray(small, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def _encode_png(rgb):
+    with timer("png_encode"):
+        buffer = io.BytesIO()
+        rgb.save(buffer, format="PNG")
+        return buffer.getvalue()
+
+
+def prepare_image(contents):
+    image = open_image(contents)
+    fmt = image.format
+    rgb, array = decode_for_model(image)
+
+    if fmt in PASSTHROUGH_FORMATS:
+        return PreparedImage(array, contents, PASSTHROUGH_FORMATS[fmt], dhash(array))
+
+    # Anything else (BMP, TIFF, ...) is re-encoded once from the decode we already have
+    return PreparedImage(array, _encode_png(rgb), ".png", dhash(array))
+
+
+def prepare_artifact(contents):
+    # Artifact only (no model input), e.g. on a classification cache hit.
+    # Image.open reads just the header, so passthrough formats are never decoded.
+    image = open_image(contents)
+    if image.format in PASSTHROUGH_FORMATS:
+        return contents, PASSTHROUGH_FORMATS[image.format]
+    return _encode_png(image.convert("RGB")), ".png"
@@ -1,40 +1,92 @@
-from fastapi import APIRouter, Request, Form, Depends
+import os
+
+from fastapi import APIRouter, Request, Form
 from fastapi.responses import RedirectResponse
 from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
 
-from waste_logger_app.database import get_db
+from waste_logger_app import concurrency, user_profiles
+from waste_logger_app.database import SessionLocal
 from waste_logger_app.models.user import User
 from waste_logger_app.utils.auth import hash_password, verify_password
+from waste_logger_app.utils.throttle import FailureThrottle
 
 templates = Jinja2Templates(directory="waste_logger_app/templates")
 router = APIRouter()
 
+# Failed logins per account and per client IP, and registrations per IP
+THROTTLE_WINDOW_SECONDS = int(os.environ.get("WASTE_LOGGER_AUTH_THROTTLE_WINDOW", "300"))
+account_throttle = FailureThrottle(int(os.environ.get("WASTE_LOGGER_MAX_LOGIN_FAILURES", "5")), THROTTLE_WINDOW_SECONDS)
+ip_throttle = FailureThrottle(int(os.environ.get("WASTE_LOGGER_MAX_IP_LOGIN_FAILURES", "20")), THROTTLE_WINDOW_SECONDS)
+registration_throttle = FailureThrottle(int(os.environ.get("WASTE_LOGGER_MAX_IP_REGISTRATIONS", "10")), 3600)
+
+
+def _client_ip(request: Request):
+    return request.client.host if request.client else "unknown"
+
+
+def _throttled(request, template, retry_after, **context):
+    response = templates.TemplateResponse(template, {
+        "request": request,
+        "error": f"Too many attempts, please try again in {retry_after} seconds",
+        **context,
+    }, status_code=429)
+    response.headers["Retry-After"] = str(retry_after)
+    return response
+
+
+def _find_user(identifier):
+    # (id, username, hashed_password) by username or email
+    with SessionLocal() as db:
+        found = db.query(User).filter((User.username == identifier) | (User.email == identifier)).first()
+        return (found.id, found.username, found.hashed_password) if found else None
+
+
+def _username_or_email_taken(username, email):
+    with SessionLocal() as db:
+        return db.query(User.id).filter((User.username == username) | (User.email == email)).first() is not None
+
+
+def _create_user(username, email, hashed_password):
+    with SessionLocal() as db:
+        new_user = User(username=username, email=email, hashed_password=hashed_password)
+        db.add(new_user)
+        db.commit()
+        return new_user.id
+
 @router.get("/register")
 def register_form(request: Request):
     return templates.TemplateResponse("register.html", {"request": request})
 
 @router.post("/register")
-def register_user(
+async def register_user(
     request: Request,
-    db: Session = Depends(get_db),
     username: str = Form(...),
     email: str = Form(...),
     password: str = Form(...)
 ):
-    existing_user = db.query(User).filter((User.username == username) | (User.email == email)).first()
-    if existing_user:
+    ip = _client_ip(request)
+    retry_after = registration_throttle.retry_after(ip)
+    if retry_after:
+        return _throttled(request, "register.html", retry_after)
+
+    if await concurrency.run_db(_username_or_email_taken, username, email):
+        return templates.TemplateResponse("register.html", {
+            "request": request,
+            "error": "Username or email already registered"
+        })
+
+    registration_throttle.record_failure(ip)  # every hash counts against the IP
+    async with concurrency.auth_admission.slot():
+        hashed_password = await concurrency.run_auth(hash_password, password)
+    try:
+        await concurrency.run_db(_create_user, username, email, hashed_password)
+    except IntegrityError:
+        # Lost a race with a concurrent registration for the same name
         return templates.TemplateResponse("register.html", {
             "request": request,
             "error": "Username or email already registered"
         })
-    new_user = User(
-        username=username,
-        email=email,
-        hashed_password=hash_password(password)
-    )
-    db.add(new_user)
-    db.commit()
     return RedirectResponse("/login", status_code=303)
 
 @router.get("/login")
@@ -42,26 +94,39 @@ def login_form(request: Request):
     return templates.TemplateResponse("login.html", {"request": request})
 
 @router.post("/login")
-def login_user(
+async def login_user(
     request: Request,
-    db: Session = Depends(get_db),
     username: str = Form(...),
     password: str = Form(...)
 ):
-    user = db.query(User).filter((User.username == username) | (User.email == username)).first()
-    if not user or not verify_password(password, user.hashed_password):
+    ip = _client_ip(request)
+    account = username.strip().lower()
+    retry_after = max(account_throttle.retry_after(account), ip_throttle.retry_after(ip))
+    if retry_after:
+        return _throttled(request, "login.html", retry_after)
+
+    user = await concurrency.run_db(_find_user, username)
+    valid = False
+    if user:
+        async with concurrency.auth_admission.slot():
+            valid = await concurrency.run_auth(verify_password, password, user[2])
+    if not valid:
+        account_throttle.record_failure(account)
+        ip_throttle.record_failure(ip)
         return templates.TemplateResponse("login.html", {
             "request": request,
             "error": "Invalid username/email or password"
         })
 
-    request.session["user_id"] = user.id
-    request.session["username"] = user.username
+    account_throttle.reset(account)
+    request.session["user_id"] = user[0]
+    request.session["username"] = user[1]
 
     return RedirectResponse("/", status_code=303)
 
 @router.get("/logout")
 def logout_user(request: Request):
+    user_profiles.invalidate(request.session.get("user_id"))
     request.session.clear()
     return RedirectResponse("/login", status_code=303)
 
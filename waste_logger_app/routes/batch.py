@@ -0,0 +1,196 @@
+import asyncio
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from typing import List
+
+from fastapi import APIRouter, Request, UploadFile, File, Depends
+from fastapi.responses import StreamingResponse
+
+from waste_logger_app import classification_cache, concurrency, model_loader, pipeline, preprocessing, uploads
+from waste_logger_app.utils.dependencies import require_login, require_model_ready
+
+router = APIRouter()
+
+# Images of one batch in flight at once (decoding, waiting on the model or the
+# caches); one NDJSON line per image, streamed as soon as its prediction resolves
+BATCH_INFLIGHT = int(os.environ.get("WASTE_LOGGER_BATCH_INFLIGHT", "32"))
+MAX_BATCH_FILES = int(os.environ.get("WASTE_LOGGER_MAX_BATCH_FILES", "500"))
+MAX_BATCH_FILE_BYTES = int(os.environ.get("WASTE_LOGGER_MAX_BATCH_FILE_BYTES", str(20 * 1024 * 1024)))
+# Whole multipart body, enforced by uploads.RequestSizeLimit before parsing
+MAX_BATCH_REQUEST_BYTES = int(os.environ.get("WASTE_LOGGER_MAX_BATCH_REQUEST_BYTES", str(512 * 1024 * 1024)))
+
+IMAGE_SUFFIXES = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".bmp", ".tif", ".tiff")
+SPOOL_MAX_MEMORY = 8 * 1024 * 1024
+
+
+def _is_zip(upload):
+    return (upload.filename or "").lower().endswith(".zip") or upload.content_type in (
+        "application/zip",
+        "application/x-zip-compressed",
+    )
+
+
+def _spool(fileobj):
+    # Starlette closes the request's upload files once the endpoint returns,
+    # but the stream keeps reading after that, so take our own copy first
+    fileobj.seek(0)
+    spooled = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_MEMORY)
+    shutil.copyfileobj(fileobj, spooled)
+    spooled.seek(0)
+    return spooled
+
+
+def _zip_members(fileobj):
+    archive = zipfile.ZipFile(fileobj)
+    return archive, [
+        info for info in archive.infolist()
+        if not info.is_dir() and info.filename.lower().endswith(IMAGE_SUFFIXES)
+    ]
+
+
+def _check_member(archive, info):
+    # Sniff a zip member from its first chunk, before decompressing the rest
+    with archive.open(info) as member:
+        return uploads.check_image_head(member.read(uploads.READ_CHUNK_BYTES))
+
+
+async def _iter_uploads(sources):
+    # sources: list of (name, is_zip, spooled file)
+    # Yields (name, bytes) or (name, error) for every image in the request;
+    # files past MAX_BATCH_FILES get an error without being read
+    count = 0
+    for name, is_zip, fileobj in sources:
+        if is_zip:
+            try:
+                archive, members = await concurrency.run_cpu(_zip_members, fileobj)
+            except zipfile.BadZipFile:
+                yield name, ValueError("not a valid zip archive")
+                continue
+            for info in members:
+                count += 1
+                if count > MAX_BATCH_FILES:
+                    yield info.filename, ValueError(f"batch limit of {MAX_BATCH_FILES} files exceeded")
+                    continue
+                if info.file_size > MAX_BATCH_FILE_BYTES:
+                    yield info.filename, ValueError("file too large")
+                    continue
+                error = await concurrency.run_cpu(_check_member, archive, info)
+                if error is not None:
+                    yield info.filename, ValueError(error)
+                    continue
+                yield info.filename, await concurrency.run_cpu(archive.read, info)
+        else:
+            count += 1
+            if count > MAX_BATCH_FILES:
+                yield name, ValueError(f"batch limit of {MAX_BATCH_FILES} files exceeded")
+                continue
+            contents = await concurrency.run_cpu(fileobj.read, MAX_BATCH_FILE_BYTES + 1)
+            if len(contents) > MAX_BATCH_FILE_BYTES:
+                yield name, ValueError("file too large")
+                continue
+            error = uploads.check_image_head(contents[:uploads.READ_CHUNK_BYTES])
+            if error is not None:
+                yield name, ValueError(error)
+                continue
+            yield name, contents
+
+
+async def _classify_one(name, contents, username):
+    # -> (NDJSON line, write-behind future or None)
+    content_hash = await concurrency.run_cpu(classification_cache.content_hash, contents)
+    try:
+        filename, output = await pipeline.classify_upload(contents, content_hash)
+    except preprocessing.ImageTooLarge:
+        return {"file": name, "error": "image dimensions too large"}, None
+    except pipeline.UnreadableImage:
+        return {"file": name, "error": "not a readable image"}, None
+
+    label, confidence, material, recyclable, co2 = model_loader.estimate(output)
+    # Group-committed with the other rows in flight; the stream waits for the
+    # commits before it ends
+    written = pipeline.log_writer.submit([dict(
+        label=label,
+        confidence=confidence,
+        material=material,
+        recyclable=recyclable,
+        co2_estimate=co2,
+        username=username,
+        filename=filename,
+    )])
+    return {
+        "file": name,
+        "label": label,
+        "confidence": confidence,
+        "material": material,
+        "recyclable": recyclable,
+        "co2": co2,
+        "image_path": f"/static/{filename}",
+    }, written
+
+
+@router.post("/classify/batch")
+async def classify_batch(
+    request: Request,
+    files: List[UploadFile] = File(...),
+    user_id: int = Depends(require_login),
+    _model_ready: None = Depends(require_model_ready),
+):
+    # The whole batch holds one admission slot until the stream is finished
+    concurrency.classify_admission.acquire()
+    username = request.session.get("username", "guest")
+    try:
+        sources = [
+            (upload.filename, _is_zip(upload), await concurrency.run_cpu(_spool, upload.file))
+            for upload in files
+        ]
+    except BaseException:
+        concurrency.classify_admission.release()
+        raise
+
+    async def stream():
+        pending = set()  # _classify_one tasks
+        writes = []  # (file name, write-behind future)
+
+        def lines(done):
+            for task in done:
+                line, written = task.result()
+                if written is not None:
+                    writes.append((line["file"], written))
+                yield json.dumps(line) + "\n"
+
+        try:
+            async for name, contents in _iter_uploads(sources):
+                if isinstance(contents, Exception):
+                    yield json.dumps({"file": name, "error": str(contents)}) + "\n"
+                    continue
+                pending.add(asyncio.ensure_future(_classify_one(name, contents, username)))
+                # Whatever has resolved goes out now; at BATCH_INFLIGHT, wait for one more
+                done = {task for task in pending if task.done()}
+                if len(pending) - len(done) >= BATCH_INFLIGHT:
+                    first, _ = await asyncio.wait(pending - done, return_when=asyncio.FIRST_COMPLETED)
+                    done |= first
+                pending -= done
+                for line in lines(done):
+                    yield line
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for line in lines(done):
+                    yield line
+
+            # Rows are committed (and on the dashboard) before the stream ends
+            for name, written in writes:
+                try:
+                    await asyncio.wrap_future(written)
+                except Exception:
+                    yield json.dumps({"file": name, "error": "could not be saved"}) + "\n"
+        finally:
+            for task in pending:
+                task.cancel()
+            for _, _, fileobj in sources:
+                fileobj.close()
+            concurrency.classify_admission.release()
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
@@ -0,0 +1,49 @@
+import os
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Request, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+
+from waste_logger_app import exports
+from waste_logger_app.log_queries import LogFilters
+from waste_logger_app.utils.dependencies import require_login
+
+router = APIRouter()
+
+# Usernames allowed to export every user's logs (comma-separated)
+EXPORT_ADMINS = {name.strip() for name in os.environ.get("WASTE_LOGGER_EXPORT_ADMINS", "").split(",") if name.strip()}
+
+
+def _parse_date(value, field):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {field}, expected YYYY-MM-DD")
+
+
+@router.get("/export/logs")
+def export_logs(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson|parquet)$"),
+    scope: str = Query("me", pattern="^(me|all)$"),
+    date_from: Optional[str] = None,
+    date_to: Optional[str] = None,
+    user_id: int = Depends(require_login),
+):
+    username = request.session.get("username")
+    if scope == "all" and username not in EXPORT_ADMINS:
+        raise HTTPException(status_code=403, detail="Exporting every user's logs is restricted")
+    if format == "parquet" and not exports.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export is not available on this server")
+
+    filters = LogFilters(_parse_date(date_from, "date_from"), _parse_date(date_to, "date_to"), None, None)
+    media_type, extension = exports.FORMATS[format]
+    filename = f"waste_logs_{'all' if scope == 'all' else username}{extension}"
+
+    # Sync generator: Starlette iterates it on the threadpool, one chunk at a time
+    return StreamingResponse(
+        exports.export(format, None if scope == "all" else username, filters),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
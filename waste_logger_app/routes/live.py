@@ -0,0 +1,23 @@
+from fastapi import APIRouter, Request, Depends
+from fastapi.responses import StreamingResponse
+
+from waste_logger_app.live_updates import broadcaster
+from waste_logger_app.utils.dependencies import require_login
+
+router = APIRouter()
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "X-Accel-Buffering": "no",  # let nginx pass events through unbuffered
+}
+
+
+@router.get("/events/leaderboard")
+async def leaderboard_events():
+    return StreamingResponse(broadcaster.stream(), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@router.get("/events/dashboard")
+async def dashboard_events(request: Request, user_id: int = Depends(require_login)):
+    username = request.session.get("username", "guest")
+    return StreamingResponse(broadcaster.stream(username), media_type="text/event-stream", headers=SSE_HEADERS)
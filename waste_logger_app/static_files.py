@@ -0,0 +1,69 @@
+# waste_logger_app/static_files.py
+#
+# StaticFiles for the uploads directory. Content-addressed files (the image
+# store and thumbnails of it) get a strong ETag from their hash and
+# `Cache-Control: immutable`, so browsers keep them for a year without
+# revalidating. Anything else is revalidated every time and answered with 304
+# when unchanged. Missing thumbnails are generated on first request.
+
+import asyncio
+import os
+
+from fastapi.staticfiles import StaticFiles
+from starlette.datastructures import Headers
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse
+from starlette.staticfiles import NotModifiedResponse
+
+from waste_logger_app import concurrency, image_store, thumbnails
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+# How long a request for an upload still being written waits for the write
+PENDING_WRITE_TIMEOUT_SECONDS = 10.0
+
+
+class UploadStaticFiles(StaticFiles):
+    async def get_response(self, path, scope):
+        try:
+            return await super().get_response(path, scope)
+        except HTTPException as exc:
+            if exc.status_code != 404:
+                raise
+            relative = path.replace(os.sep, "/")
+            if await self._wait_for_write(relative) and image_store.store.exists(relative):
+                return await super().get_response(path, scope)
+            if not await concurrency.run_cpu(thumbnails.ensure, relative):
+                raise
+            return await super().get_response(path, scope)
+
+    async def _wait_for_write(self, relative):
+        # Uploads are written in the background (ImageStore.put_async), so the
+        # result page can ask for an image, or a thumbnail of it, before it is
+        # on disk. Returns True when there was a write to wait for.
+        parsed = thumbnails.source_for(relative)
+        pending = image_store.store.pending_write(relative if parsed is None else parsed[1])
+        if pending is None:
+            return False
+        try:
+            # shield: a timed-out request must not cancel the write itself
+            await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(pending)), PENDING_WRITE_TIMEOUT_SECONDS)
+        except Exception:
+            pass  # failed or slow write: fall through to the usual 404
+        return True
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result)
+        relative = os.path.relpath(os.path.realpath(full_path), os.path.realpath(self.directory)).replace(os.sep, "/")
+        if thumbnails.is_content_addressed(relative):
+            # The name carries the SHA-256 of the original, so it is a strong validator
+            parsed = thumbnails.source_for(relative)
+            tag = os.path.basename(relative) if parsed is None else f"{parsed[0]}-{os.path.basename(relative)}"
+            response.headers["etag"] = f'"{tag}"'
+            response.headers["cache-control"] = IMMUTABLE
+        else:
+            response.headers["cache-control"] = REVALIDATE
+
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,94 @@
+# waste_logger_app/thumbnails.py
+#
+# Small display copies of stored uploads. Thumbnails are written next to the
+# originals under static/thumbs/<size>/<original filename><ext> as soon as an
+# image enters the store, and generated on first request for anything older
+# (see static_files.py). Like the originals they never change once written.
+
+import io
+import os
+
+from PIL import features
+
+from waste_logger_app.image_store import STORE_PREFIX, store
+from waste_logger_app.metrics import timer
+from waste_logger_app.preprocessing import open_image
+
+THUMB_PREFIX = "thumbs"
+
+# Longest edge in pixels: "sm" for lists, "md" for the result page
+SIZES = {"sm": 160, "md": 480}
+DEFAULT_SIZE = "sm"
+
+# WebP where Pillow was built with it, JPEG otherwise
+if features.check("webp"):
+    FORMAT, EXTENSION, SAVE_OPTIONS = "WEBP", ".webp", {"quality": 80, "method": 4}
+else:
+    FORMAT, EXTENSION, SAVE_OPTIONS = "JPEG", ".jpg", {"quality": 82, "optimize": True, "progressive": True}
+
+
+def thumbnail_path(filename, size=DEFAULT_SIZE):
+    # Relative to static/, like WasteLog.filename
+    return f"{THUMB_PREFIX}/{size}/{filename}{EXTENSION}"
+
+
+def source_for(thumb_filename):
+    # Inverse of thumbnail_path: (size, original filename) or None
+    parts = thumb_filename.split("/", 2)
+    if len(parts) != 3 or parts[0] != THUMB_PREFIX or parts[1] not in SIZES or not parts[2].endswith(EXTENSION):
+        return None
+    return parts[1], parts[2][: -len(EXTENSION)]
+
+
+def url(filename, size=DEFAULT_SIZE):
+    # Jinja helper; falls back to nothing for rows without an image
+    return f"/static/{thumbnail_path(filename, size)}" if filename else ""
+
+
+def render(contents, size=DEFAULT_SIZE):
+    edge = SIZES[size]
+    with timer("thumbnail"):
+        image = open_image(contents)
+        if image.format == "JPEG":
+            image.draft("RGB", (edge, edge))  # decode at reduced scale
+        image = image.convert("RGBA" if FORMAT == "WEBP" and image.mode in ("RGBA", "LA", "P") else "RGB")
+        image.thumbnail((edge, edge))
+        buffer = io.BytesIO()
+        image.save(buffer, format=FORMAT, **SAVE_OPTIONS)
+        return buffer.getvalue()
+
+
+def make_thumbnails(filename, contents):
+    # ImageStore derivative hook: every size for a newly stored image
+    for size in SIZES:
+        store.put_named(thumbnail_path(filename, size), render(contents, size))
+
+
+def ensure(thumb_filename):
+    # Lazily create a missing thumbnail; returns False when there is no source image
+    parsed = source_for(thumb_filename)
+    if parsed is None:
+        return False
+    size, filename = parsed
+    source = store.absolute_path(filename)
+    if not os.path.isfile(source) or filename.startswith(THUMB_PREFIX + "/"):
+        return False
+    with open(source, "rb") as f:
+        contents = f.read()
+    try:
+        thumbnail = render(contents, size)
+    except OSError:
+        return False  # not an image Pillow can read
+    store.put_named(thumb_filename, thumbnail)
+    return True
+
+
+def is_content_addressed(filename):
+    # Originals in the store and thumbnails of them never change under the same name
+    parsed = source_for(filename)
+    if parsed is not None:
+        filename = parsed[1]
+    return filename.startswith(STORE_PREFIX + "/")
+
+
+store.derivatives.append(make_thumbnails)
@@ -0,0 +1,139 @@
+# waste_logger_app/uploads.py
+#
+# Upload intake for the classify routes. Rejections happen as early as
+# possible and before any full decode:
+#   1. RequestSizeLimit answers 413 from the Content-Length header alone and
+#      cuts off bodies that stream past the cap, so oversized requests are
+#      never parsed or buffered.
+#   2. read_upload() walks the upload in chunks, hashing as it goes; the first
+#      chunk's magic bytes must match a supported image format and its header
+#      must declare a sane pixel count (415 / 413 otherwise).
+# Starlette already spools multipart file parts to disk above 1 MB, so an
+# upload is only pulled into memory after it has passed every check.
+
+import hashlib
+import os
+
+from fastapi import HTTPException
+from starlette.responses import JSONResponse
+
+from waste_logger_app.preprocessing import ImageTooLarge, open_image
+
+MAX_UPLOAD_BYTES = int(os.environ.get("WASTE_LOGGER_MAX_UPLOAD_BYTES", str(20 * 1024 * 1024)))
+READ_CHUNK_BYTES = 64 * 1024
+# Multipart boundaries and form fields on top of the file itself
+FORM_OVERHEAD_BYTES = 64 * 1024
+
+# Leading bytes of the formats preprocessing accepts
+MAGIC_NUMBERS = (
+    (b"\xff\xd8\xff", "JPEG"),
+    (b"\x89PNG\r\n\x1a\n", "PNG"),
+    (b"GIF87a", "GIF"),
+    (b"GIF89a", "GIF"),
+    (b"BM", "BMP"),
+    (b"II*\x00", "TIFF"),
+    (b"MM\x00*", "TIFF"),
+)
+
+
+def sniff_format(head):
+    # Image format from the first bytes, or None
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "WEBP"
+    for magic, fmt in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return fmt
+    return None
+
+
+def check_image_head(head):
+    # Error message for bytes that must not reach the decoder, or None. `head`
+    # may be just the first chunk; if the header runs past it, the full decode
+    # in preprocessing applies the same pixel limit.
+    if sniff_format(head) is None:
+        return "not a supported image (JPEG, PNG, WebP, GIF, BMP or TIFF)"
+    try:
+        open_image(head)
+    except ImageTooLarge:
+        return "image dimensions too large"
+    except Exception:
+        pass  # header incomplete in this chunk
+    return None
+
+
+class IncomingImage:
+    # A validated upload: spooled file, byte size and SHA-256, computed while reading
+    def __init__(self, file, size, content_hash, image_format):
+        self.file = file
+        self.size = size
+        self.content_hash = content_hash
+        self.format = image_format
+
+    def read(self):
+        self.file.seek(0)
+        return self.file.read()
+
+
+async def read_upload(upload, max_bytes=MAX_UPLOAD_BYTES):
+    # Raises HTTPException 413/415; never decodes more than the header
+    digest = hashlib.sha256()
+    size = 0
+    image_format = None
+    while True:
+        chunk = await upload.read(READ_CHUNK_BYTES)
+        if not chunk:
+            break
+        if image_format is None:
+            image_format = sniff_format(chunk)
+            error = check_image_head(chunk)
+            if error is not None:
+                raise HTTPException(status_code=415 if image_format is None else 413, detail=error)
+        size += len(chunk)
+        if size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"Upload exceeds {max_bytes // (1024 * 1024)} MB")
+        digest.update(chunk)
+
+    if image_format is None:
+        raise HTTPException(status_code=415, detail="Empty upload")
+    await upload.seek(0)
+    return IncomingImage(upload.file, size, digest.hexdigest(), image_format)
+
+
+class _BodyTooLarge(HTTPException):
+    def __init__(self, limit):
+        super().__init__(status_code=413, detail=f"Request body exceeds {limit // (1024 * 1024)} MB")
+
+
+class RequestSizeLimit:
+    # ASGI middleware: per-path caps on POST bodies, enforced before parsing
+    def __init__(self, app, limits):
+        self.app = app
+        self.limits = limits  # path -> max bytes
+
+    async def __call__(self, scope, receive, send):
+        limit = self.limits.get(scope.get("path")) if scope["type"] == "http" and scope["method"] == "POST" else None
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            too_large = _BodyTooLarge(limit)
+            response = JSONResponse({"detail": too_large.detail}, status_code=413, headers={"Connection": "close"})
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            # Chunked or lying clients: stop reading once past the cap. The
+            # exception surfaces in the route's form parsing as a 413.
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise _BodyTooLarge(limit)
+            return message
+
+        await self.app(scope, limited_receive, send)
@@ -0,0 +1,32 @@
+# waste_logger_app/user_profiles.py
+#
+# Short-lived cache of user id -> profile so page views do not query the
+# users table for data the session already implies. Entries are dropped on
+# logout; the TTL bounds staleness for anything else. A new account's id has
+# never been looked up, so registration has nothing to invalidate.
+
+import os
+
+from waste_logger_app.models.user import User
+from waste_logger_app.utils.ttl_cache import TTLCache
+
+PROFILE_TTL_SECONDS = float(os.environ.get("WASTE_LOGGER_PROFILE_TTL", "60"))
+
+profile_cache = TTLCache(ttl=PROFILE_TTL_SECONDS, max_entries=10000)
+
+
+def get_profile(db, user_id):
+    # {"id", "username", "email"} or None for an unknown id
+    profile = profile_cache.get(user_id)
+    if profile is None:
+        db_user = db.query(User).filter(User.id == user_id).first()
+        if db_user is None:
+            return None
+        profile = {"id": db_user.id, "username": db_user.username, "email": db_user.email}
+        profile_cache.set(user_id, profile)
+    return profile
+
+
+def invalidate(user_id):
+    if user_id is not None:
+        profile_cache.invalidate(user_id)
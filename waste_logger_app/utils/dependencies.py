@@ -1,7 +1,31 @@
+import math
+
 from fastapi import Request, HTTPException
 
 def require_login(request: Request):
     user_id = request.session.get("user_id")
     if not user_id:
         raise HTTPException(status_code=401, detail="Not authenticated")
-    return user_id
\ No newline at end of file
+    return user_id
+
+def require_model_ready():
+    # Classification needs the model; everything else works while it loads.
+    # Starts the load if nothing has yet (WASTE_LOGGER_PRELOAD_MODEL=0) and
+    # retries a failed one once its backoff has passed.
+    from waste_logger_app import model_loader
+
+    if model_loader.is_ready():
+        return
+    model_loader.start_background_load()
+    status = model_loader.status()
+    if status["status"] == "error":
+        raise HTTPException(
+            status_code=503,
+            detail=f"Model failed to load: {status['error']}",
+            headers={"Retry-After": str(max(1, math.ceil(model_loader.retry_after())))},
+        )
+    raise HTTPException(
+        status_code=503,
+        detail="Model is still loading, please retry shortly",
+        headers={"Retry-After": "5"},
+    )
@@ -0,0 +1,54 @@
+from collections import defaultdict
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class MultiIndexHash:
+    # Exact Hamming-radius search over fixed-width integer hashes. Keys are
+    # split into max_distance + 1 blocks; by the pigeonhole principle any key
+    # within max_distance bits of the query agrees with it exactly on at least
+    # one block, so only those buckets are checked instead of every key.
+
+    def __init__(self, max_distance, bits=64):
+        if not 0 <= max_distance < bits:
+            raise ValueError(f"max_distance must be between 0 and {bits - 1}")
+        self.max_distance = max_distance
+        count = max_distance + 1
+        width, extra = divmod(bits, count)
+        self._blocks = []  # (shift, mask)
+        shift = 0
+        for index in range(count):
+            size = width + (1 if index < extra else 0)
+            self._blocks.append((shift, (1 << size) - 1))
+            shift += size
+        self._tables = [defaultdict(list) for _ in self._blocks]
+        self._keys = []
+        self._values = []
+
+    def add(self, key, value):
+        ident = len(self._keys)
+        self._keys.append(key)
+        self._values.append(value)
+        for (shift, mask), table in zip(self._blocks, self._tables):
+            table[(key >> shift) & mask].append(ident)
+
+    def search(self, key, max_distance=None):
+        # [(distance, value)], nearest first
+        limit = self.max_distance if max_distance is None else min(max_distance, self.max_distance)
+        seen = set()
+        found = []
+        for (shift, mask), table in zip(self._blocks, self._tables):
+            for ident in table.get((key >> shift) & mask, ()):
+                if ident in seen:
+                    continue
+                seen.add(ident)
+                distance = hamming(key, self._keys[ident])
+                if distance <= limit:
+                    found.append((distance, self._values[ident]))
+        found.sort(key=lambda item: item[0])
+        return found
+
+    def __len__(self):
+        return len(self._keys)
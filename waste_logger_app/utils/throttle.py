@@ -0,0 +1,50 @@
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+class FailureThrottle:
+    # Blocks a key (account name, client IP) once it has `max_failures`
+    # recorded within the last `window` seconds
+
+    def __init__(self, max_failures, window, max_keys=10000):
+        self.max_failures = max_failures
+        self.window = window
+        self.max_keys = max_keys
+        self._failures = OrderedDict()
+        self._lock = threading.Lock()
+
+    def retry_after(self, key):
+        # Seconds until the key may try again, 0 when it is not blocked
+        with self._lock:
+            recent = self._prune(key)
+            if recent is None or len(recent) < self.max_failures:
+                return 0
+            return max(1, math.ceil(recent[0] + self.window - time.monotonic()))
+
+    def record_failure(self, key):
+        with self._lock:
+            recent = self._prune(key)
+            if recent is None:
+                recent = self._failures[key] = deque()
+                if len(self._failures) > self.max_keys:
+                    self._failures.popitem(last=False)
+            recent.append(time.monotonic())
+            self._failures.move_to_end(key)
+
+    def reset(self, key):
+        with self._lock:
+            self._failures.pop(key, None)
+
+    def _prune(self, key):
+        recent = self._failures.get(key)
+        if recent is None:
+            return None
+        cutoff = time.monotonic() - self.window
+        while recent and recent[0] < cutoff:
+            recent.popleft()
+        if not recent:
+            del self._failures[key]
+            return None
+        return recent
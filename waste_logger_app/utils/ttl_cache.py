@@ -0,0 +1,46 @@
+import threading
+import time
+
+
+class TTLCache:
+    # Small thread-safe key -> value cache where entries expire after `ttl` seconds
+
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._data) >= self.max_entries and key not in self._data:
+                self._evict()
+            self._data[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def _evict(self):
+        # Drop expired entries, then the oldest if still full
+        now = time.monotonic()
+        for key in [k for k, (expires, _) in self._data.items() if expires < now]:
+            del self._data[key]
+        if len(self._data) >= self.max_entries:
+            oldest = min(self._data, key=lambda k: self._data[k][0])
+            del self._data[oldest]
@@ -7,7 +7,7 @@ def log_item(filename, label, material, recyclable, co2_kg):
         writer = csv.writer(file)
         writer.writerow([filename, label, material, recyclable, co2_kg])
 
-def read_log():
-    with open(WASTE_LOG_PATH, newline="") as file:
+def read_log(path=None):
+    with open(path or WASTE_LOG_PATH, newline="") as file:
         reader = csv.DictReader(file)
         return list(reader)
\ No newline at end of file
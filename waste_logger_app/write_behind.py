@@ -0,0 +1,125 @@
+# waste_logger_app/write_behind.py
+#
+# Group-commit queue for WasteLog inserts. Requests hand their rows to
+# submit() and get a Future back; a single writer thread drains the queue
+# and commits everything that arrived within `max_delay_ms` (or `max_rows`
+# rows) in one transaction, so concurrent uploads share one SQLite lock
+# acquisition and one fsync. Await the Future when the caller needs the row
+# to be durable before responding.
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+
+class WriteBehindQueue:
+    def __init__(self, write_rows, max_rows=256, max_delay_ms=20):
+        # write_rows(rows) must write and commit all rows in one transaction
+        self.write_rows = write_rows
+        self.max_rows = max(1, int(max_rows))
+        self.max_delay = max(0.0, float(max_delay_ms)) / 1000.0
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker = None
+        self._stopped = False
+
+        self.commits = 0
+        self.rows_written = 0
+        self.failures = 0
+
+    def submit(self, rows):
+        future = Future()
+        if self._stopped:
+            future.set_exception(RuntimeError("write-behind queue is closed"))
+            return future
+        self._ensure_worker()
+        self._queue.put((list(rows), future))
+        return future
+
+    def close(self, timeout=None):
+        # Commit whatever is queued, then stop the writer
+        self._stopped = True
+        if self._worker is not None and self._worker.is_alive():
+            self._queue.put(_STOP)
+            self._worker.join(timeout)
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize(),
+            "commits": self.commits,
+            "rows_written": self.rows_written,
+            "failures": self.failures,
+        }
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._worker.start()
+
+    def _collect(self):
+        # Block for the first submission, then gather until the group is full or the delay is up
+        first = self._queue.get()
+        if first is _STOP:
+            return [], True
+        group, count = [first], len(first[0])
+        deadline = time.monotonic() + self.max_delay
+        while count < self.max_rows:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return group, True
+            group.append(item)
+            count += len(item[0])
+        return group, False
+
+    def _run(self):
+        while True:
+            group, stop = self._collect()
+            if group:
+                self._commit(group)
+            if stop:
+                # Drain anything submitted before close()
+                leftovers = []
+                while True:
+                    try:
+                        item = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is not _STOP:
+                        leftovers.append(item)
+                if leftovers:
+                    self._commit(leftovers)
+                return
+
+    def _commit(self, group):
+        rows = [row for submitted, _ in group for row in submitted]
+        try:
+            self.write_rows(rows)
+        except Exception:
+            # Retry each submission alone so one bad row only fails its own request
+            self.failures += 1
+            for submitted, future in group:
+                try:
+                    self.write_rows(submitted)
+                except Exception as exc:
+                    future.set_exception(exc)
+                else:
+                    self.commits += 1
+                    self.rows_written += len(submitted)
+                    future.set_result(len(submitted))
+            return
+
+        self.commits += 1
+        self.rows_written += len(rows)
+        for submitted, future in group:
+            future.set_result(len(submitted))